@@ -57,6 +57,7 @@ MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
+    'survey.admission.AdmissionControlMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
@@ -95,6 +96,19 @@ DATABASES = {
 }
 
 
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Les résultats des sondages y sont conservés par version ; le cache fichier
+# (django.core.cache.backends.filebased.FileBasedCache) convient aussi.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'app-sondage',
+    }
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -137,6 +151,32 @@ STATICFILES_DIRS = [ os.path.join(BASE_DIR, "static"),]
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# Écriture groupée des participations (voir survey/writer.py) : un thread par
+# processus enregistre les participations par lots pour soulager le verrou
+# d'écriture de SQLite lors des afflux.
+SURVEY_GROUP_COMMIT = False
+SURVEY_GROUP_COMMIT_BATCH_SIZE = 50
+SURVEY_GROUP_COMMIT_MAX_LATENCY = 0.005
+
+# Contrôle d'admission des soumissions (voir survey/admission.py) : au-delà de
+# ces limites par processus, une soumission reçoit une réponse 503 avec
+# Retry-After plutôt que de ralentir toutes les autres pages.
+SURVEY_ADMISSION_MAX_CONCURRENT = 8
+SURVEY_ADMISSION_MAX_QUEUE = 16
+SURVEY_ADMISSION_QUEUE_TIMEOUT = 0.5
+SURVEY_ADMISSION_RETRY_AFTER = 5
+
+# Durée (secondes) des compteurs de sondages par statut (voir survey/counters.py).
+# Avec le cache mémoire local, propre à chaque processus, c'est le retard
+# maximal des compteurs des autres processus après une création ou publication.
+SURVEY_STATUS_COUNTS_TIMEOUT = 30
+
+# Durées (secondes) de la liste partagée des sondages en cours et des ensembles
+# de participations par utilisateur (voir survey/availability.py) : retard
+# maximal des autres processus avec le cache mémoire local.
+SURVEY_ACTIVE_SURVEYS_TIMEOUT = 30
+SURVEY_ANSWERED_SURVEYS_TIMEOUT = 30
+
 LOGIN_REDIRECT_URL = 'home'
 LOGOUT_REDIRECT_URL = 'home'
 LOGIN_URL = 'signin'
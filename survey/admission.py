@@ -0,0 +1,182 @@
+"""Contrôle d'admission des participations lors des afflux.
+
+Quand le lien d'un sondage est envoyé à une longue liste de diffusion, les
+soumissions arrivent en rafale et occupent tous les workers : toutes les pages
+ralentissent, y compris l'édition et les résultats. Le middleware limite le
+nombre de soumissions traitées en même temps par processus. Une soumission
+en excès attend brièvement une place ; passé ce délai, ou si la file est
+pleine, elle reçoit une réponse 503 avec `Retry-After` et les autres vues
+restent réactives.
+
+Réglages :
+- `SURVEY_ADMISSION_MAX_CONCURRENT` : soumissions simultanées par processus
+  (None désactive la limite) ;
+- `SURVEY_ADMISSION_MAX_QUEUE` : soumissions en attente au-delà desquelles
+  les suivantes sont refusées sans attendre ;
+- `SURVEY_ADMISSION_QUEUE_TIMEOUT` : attente maximale (secondes) d'une place ;
+- `SURVEY_ADMISSION_RETRY_AFTER` : délai (secondes) conseillé au client refusé.
+"""
+import logging
+import threading
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from django.urls import Resolver404, resolve
+
+logger = logging.getLogger(__name__)
+
+# Vues de soumission soumises au contrôle d'admission (requêtes POST)
+ADMISSION_ROUTES = {
+    'surveys:participate',
+    'surveys:participate_draft',
+    'surveys:public_participate',
+    'surveys:api_submissions',
+}
+
+# Vues dont le refus est renvoyé en JSON
+JSON_ROUTES = {'surveys:participate_draft', 'surveys:api_submissions'}
+
+_limiter = None
+_limiter_lock = threading.Lock()
+
+
+class AdmissionLimiter:
+    """Nombre borné de soumissions simultanées, avec une courte file d'attente."""
+
+    def __init__(self, max_concurrent, max_queue, queue_timeout):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.semaphore = threading.BoundedSemaphore(max_concurrent)
+        self.lock = threading.Lock()
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+
+    def acquire(self):
+        """Attend une place ; retourne False si la soumission doit être refusée."""
+        if self.semaphore.acquire(blocking=False):
+            return self.admit()
+        with self.lock:
+            if self.waiting >= self.max_queue:
+                return self.reject()
+            self.waiting += 1
+        try:
+            acquired = self.semaphore.acquire(timeout=self.queue_timeout)
+        finally:
+            with self.lock:
+                self.waiting -= 1
+        if not acquired:
+            with self.lock:
+                return self.reject()
+        return self.admit()
+
+    def admit(self):
+        with self.lock:
+            self.active += 1
+            self.admitted += 1
+        return True
+
+    def reject(self):
+        # Appelée avec self.lock acquis
+        self.rejected += 1
+        logger.warning(
+            "Soumission refusée : %s en cours, %s en attente, %s refus au total",
+            self.active, self.waiting, self.rejected
+        )
+        return False
+
+    def release(self):
+        with self.lock:
+            self.active -= 1
+        self.semaphore.release()
+
+    def stats(self):
+        with self.lock:
+            return {
+                'max_concurrent': self.max_concurrent,
+                'active': self.active,
+                'queue_depth': self.waiting,
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+            }
+
+
+def get_limiter():
+    """Limiteur du processus, créé au premier appel ; None si la limite est désactivée."""
+    global _limiter
+    max_concurrent = getattr(settings, 'SURVEY_ADMISSION_MAX_CONCURRENT', None)
+    if not max_concurrent:
+        return None
+    with _limiter_lock:
+        if _limiter is None:
+            _limiter = AdmissionLimiter(
+                max_concurrent,
+                getattr(settings, 'SURVEY_ADMISSION_MAX_QUEUE', max_concurrent * 2),
+                getattr(settings, 'SURVEY_ADMISSION_QUEUE_TIMEOUT', 0.5),
+            )
+    return _limiter
+
+
+class AdmissionControlMiddleware:
+    """Applique le contrôle d'admission aux soumissions (voir le module)."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        limiter = self.get_limiter(request)
+        if limiter is None:
+            return self.get_response(request)
+        if not limiter.acquire():
+            return self.reject(request)
+        try:
+            return self.get_response(request)
+        finally:
+            limiter.release()
+
+    async def __acall__(self, request):
+        limiter = self.get_limiter(request)
+        if limiter is None:
+            return await self.get_response(request)
+        # L'attente d'une place ne doit pas bloquer la boucle d'événements
+        if not await sync_to_async(limiter.acquire, thread_sensitive=False)():
+            return self.reject(request)
+        try:
+            return await self.get_response(request)
+        finally:
+            limiter.release()
+
+    def get_limiter(self, request):
+        """Limiteur à appliquer à la requête, ou None si elle n'est pas une soumission."""
+        if request.method != 'POST':
+            return None
+        limiter = get_limiter()
+        if limiter is None:
+            return None
+        request.admission_route = self.route_name(request)
+        return limiter if request.admission_route in ADMISSION_ROUTES else None
+
+    def route_name(self, request):
+        try:
+            return resolve(request.path_info).view_name
+        except Resolver404:
+            return None
+
+    def reject(self, request):
+        message = "Le service reçoit trop de participations, veuillez réessayer dans quelques instants."
+        if request.admission_route in JSON_ROUTES:
+            response = JsonResponse({'error': message}, status=503)
+        else:
+            response = HttpResponse(message, status=503, content_type='text/plain; charset=utf-8')
+        response['Retry-After'] = str(getattr(settings, 'SURVEY_ADMISSION_RETRY_AFTER', 5))
+        return response
@@ -0,0 +1,99 @@
+"""Sondages disponibles pour un participant, servis depuis le cache.
+
+La liste des sondages disponibles combine deux entrées de cache :
+- la liste partagée des sondages publiés et non terminés, reconstruite à
+  son expiration ou après la modification d'un sondage ;
+- l'ensemble des ids des sondages auxquels chaque utilisateur a répondu,
+  chargé depuis `Response` à la première lecture puis complété à chaque
+  participation.
+Pour la plupart des utilisateurs, la page ne coûte donc qu'une lecture du
+cache et une différence d'ensembles en mémoire, sans requête sur `Response`.
+
+Les mises à jour ne touchent que le cache du processus qui a traité
+l'écriture : avec le cache mémoire local, les autres processus gardent leurs
+entrées jusqu'à expiration. `SURVEY_ACTIVE_SURVEYS_TIMEOUT` et
+`SURVEY_ANSWERED_SURVEYS_TIMEOUT` bornent donc ce retard ; ils peuvent être
+allongés si le cache est partagé entre processus.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+ACTIVE_SURVEYS_KEY = 'active-surveys'
+
+
+def active_surveys_timeout():
+    return getattr(settings, 'SURVEY_ACTIVE_SURVEYS_TIMEOUT', 30)
+
+
+def answered_surveys_timeout():
+    return getattr(settings, 'SURVEY_ANSWERED_SURVEYS_TIMEOUT', 30)
+
+
+def answered_surveys_key(user_id):
+    return f'answered-surveys:{user_id}'
+
+
+def unfinished_surveys():
+    """Sondages publiés non terminés, y compris ceux à venir : ils deviennent disponibles sans reconstruire la liste."""
+    from .models import Survey
+
+    return Survey.objects.filter(
+        status='published',
+        end_date__gte=timezone.now()
+    ).order_by('-created_at', '-id')
+
+
+def active_surveys():
+    """Sondages publiés en cours, du plus récent au plus ancien (liste partagée en cache)."""
+    surveys = cache.get(ACTIVE_SURVEYS_KEY)
+    if surveys is None:
+        surveys = list(unfinished_surveys())
+        cache.set(ACTIVE_SURVEYS_KEY, surveys, active_surveys_timeout())
+    now = timezone.now()
+    return [survey for survey in surveys if survey.start_date <= now <= survey.end_date]
+
+
+def answered_survey_ids(user):
+    """Ids des sondages auxquels `user` a répondu, chargés depuis la base au premier accès."""
+    from .models import Response
+
+    key = answered_surveys_key(user.pk)
+    survey_ids = cache.get(key)
+    if survey_ids is None:
+        survey_ids = set(Response.objects.filter(respondent=user).values_list('survey_id', flat=True))
+        cache.set(key, survey_ids, answered_surveys_timeout())
+    return survey_ids
+
+
+def available_surveys(user):
+    answered = answered_survey_ids(user)
+    return [survey for survey in active_surveys() if survey.pk not in answered]
+
+
+def remember_participations(pairs):
+    """Ajoute des participations (id du participant, id du sondage) aux ensembles en cache.
+
+    Un ensemble absent du cache n'est pas créé : il sera chargé à sa prochaine lecture.
+    """
+    survey_ids = {}
+    for user_id, survey_id in pairs:
+        if user_id is not None:
+            survey_ids.setdefault(user_id, set()).add(survey_id)
+    if not survey_ids:
+        return
+    keys = {answered_surveys_key(user_id): user_id for user_id in survey_ids}
+    cached = cache.get_many(keys)
+    cache.set_many(
+        {key: answered | survey_ids[keys[key]] for key, answered in cached.items()},
+        answered_surveys_timeout()
+    )
+
+
+def forget_participations(user_id):
+    """Oublie l'ensemble d'un utilisateur (participation supprimée) : il sera rechargé."""
+    cache.delete(answered_surveys_key(user_id))
+
+
+def invalidate_active_surveys():
+    cache.delete(ACTIVE_SURVEYS_KEY)
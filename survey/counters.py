@@ -0,0 +1,55 @@
+"""Nombre de sondages par statut, conservés dans le cache.
+
+La liste des sondages affiche le total et le nombre de sondages publiés et en
+brouillon. Sans filtre, ces compteurs sont lus dans le cache ; ils sont
+ajustés (`cache.incr`) à la création, à la publication et à la suppression
+d'un sondage, une fois la transaction validée. S'ils manquent (cache vidé,
+expiration), ils sont recalculés en une seule requête d'agrégation.
+
+L'ajustement ne touche que le cache du processus qui a traité l'écriture :
+avec le cache mémoire local, les autres processus gardent leurs compteurs
+jusqu'à expiration. `SURVEY_STATUS_COUNTS_TIMEOUT` borne donc ce retard ; il
+peut être allongé si le cache est partagé entre processus.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, Q
+
+STATUSES = ('draft', 'published')
+
+
+def status_count_key(status):
+    return f'survey-status-count:{status}'
+
+
+def aggregate_status_counts(queryset):
+    """Total et nombre de sondages par statut de `queryset`, en une requête."""
+    return queryset.aggregate(
+        total=Count('pk'),
+        **{status: Count('pk', filter=Q(status=status)) for status in STATUSES}
+    )
+
+
+def read_status_counts():
+    """Compteurs de tous les sondages : depuis le cache, ou recalculés puis mis en cache."""
+    from .models import Survey
+
+    keys = {status: status_count_key(status) for status in STATUSES}
+    cached = cache.get_many(keys.values())
+    if len(cached) == len(keys):
+        counts = {status: cached[key] for status, key in keys.items()}
+        counts['total'] = sum(counts.values())
+        return counts
+    counts = aggregate_status_counts(Survey.objects.all())
+    timeout = getattr(settings, 'SURVEY_STATUS_COUNTS_TIMEOUT', 30)
+    cache.set_many({key: counts[status] for status, key in keys.items()}, timeout)
+    return counts
+
+
+def adjust_status_count(status, delta):
+    """Ajoute `delta` au compteur d'un statut, s'il est en cache."""
+    try:
+        cache.incr(status_count_key(status), delta)
+    except ValueError:
+        # Compteur absent : il sera recalculé à la prochaine lecture
+        pass
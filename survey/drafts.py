@@ -0,0 +1,100 @@
+"""Brouillons de participation enregistrés au fil de la saisie.
+
+Un brouillon est un dictionnaire compact {id de question (texte): valeur},
+au format des réponses de l'API JSON : id de choix, liste d'ids de choix ou
+texte. Les lignes `Response`/`Answer` ne sont créées qu'à la soumission
+finale.
+
+Les réponses des pages validées (suivante, précédente, soumission) sont
+conservées dans la session du participant : c'est d'elles que la soumission
+finale reconstruit la participation, elles ne doivent donc pas dépendre d'un
+cache qui peut les évincer ou ne pas être partagé entre processus. La session
+n'est réécrite que si le brouillon change.
+
+Les enregistrements automatiques fréquents de la page en cours ne servent
+qu'à pré-remplir le formulaire : ils se fondent dans une seule entrée de
+cache par participant, sans aucune écriture en base. Leur perte ne coûte que
+la saisie de la page en cours, qui est de toute façon renvoyée avec elle.
+"""
+from django.core.cache import cache
+
+from .services import ANSWER_FIELDS
+
+# Durée de conservation d'un enregistrement automatique sans nouvelle saisie
+DRAFT_TIMEOUT = 60 * 60 * 24 * 7
+
+# Longueur maximale conservée pour une réponse texte
+DRAFT_TEXT_MAX_LENGTH = 10000
+
+
+def draft_key(survey, user):
+    return f'survey-draft:{survey.pk}:{user.pk}'
+
+
+def merge_values(draft, values):
+    """Copie de `draft` complétée par `values` ; une valeur None retire la question."""
+    draft = dict(draft)
+    for question_id, value in values.items():
+        if value is None:
+            draft.pop(question_id, None)
+        else:
+            draft[question_id] = value
+    return draft
+
+
+def load_draft(request, survey):
+    """Brouillon affiché : réponses des pages validées, complétées par l'enregistrement automatique."""
+    key = draft_key(survey, request.user)
+    return merge_values(request.session.get(key, {}), cache.get(key) or {})
+
+
+def extract_draft_values(questions, data):
+    """Valeurs saisies dans `data` (POST) pour les questions `questions` du schéma.
+
+    Les choix inconnus de la question sont ignorés ; une question sans valeur
+    est retirée du brouillon (valeur None).
+    """
+    values = {}
+    for question in questions:
+        name = f'question_{question.id}-{ANSWER_FIELDS[question.question_type]}'
+        if question.question_type == 'text':
+            text = data.get(name, '')
+            values[str(question.id)] = text[:DRAFT_TEXT_MAX_LENGTH] or None
+            continue
+        choice_ids = {choice.id for choice in question.choices}
+        selected = [int(value) for value in data.getlist(name) if value.isdigit() and int(value) in choice_ids]
+        if question.question_type == 'single':
+            values[str(question.id)] = selected[0] if selected else None
+        else:
+            values[str(question.id)] = selected or None
+    return values
+
+
+def save_draft(request, survey, values):
+    """Fusionne `values` (page validée) dans le brouillon de la session et le retourne."""
+    key = draft_key(survey, request.user)
+    saved = request.session.get(key, {})
+    draft = merge_values(saved, values)
+    if draft != saved:
+        request.session[key] = draft
+    # L'enregistrement automatique de ces questions est dépassé
+    autosaved = cache.get(key)
+    if autosaved and autosaved.keys() & values.keys():
+        remaining = {question_id: value for question_id, value in autosaved.items() if question_id not in values}
+        cache.set(key, remaining, DRAFT_TIMEOUT)
+    return draft
+
+
+def autosave_draft(request, survey, values):
+    """Enregistrement automatique de la page en cours, dans le cache seulement ; retourne le brouillon affiché."""
+    key = draft_key(survey, request.user)
+    autosaved = cache.get(key) or {}
+    autosaved.update(values)
+    cache.set(key, autosaved, DRAFT_TIMEOUT)
+    return merge_values(request.session.get(key, {}), autosaved)
+
+
+def delete_draft(request, survey):
+    key = draft_key(survey, request.user)
+    request.session.pop(key, None)
+    cache.delete(key)
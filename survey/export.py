@@ -0,0 +1,97 @@
+"""Export en flux des réponses brutes d'un sondage.
+
+Une ligne est produite par `Response`, avec une colonne par question. Les
+réponses sont parcourues par paquets avec leurs réponses aux questions
+préchargées, si bien que la mémoire utilisée ne dépend pas du nombre de
+participants.
+"""
+import csv
+import json
+
+from django.db.models import Prefetch
+
+from .models import Answer, Choice, Response
+
+EXPORT_CHUNK_SIZE = 500
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson; charset=utf-8',
+}
+
+
+class Echo:
+    """Pseudo-tampon : `csv.writer` y écrit et récupère directement la ligne formatée."""
+
+    def write(self, value):
+        return value
+
+
+def iter_response_rows(survey, questions):
+    """Génère (réponse, valeurs par question) pour chaque participation au sondage.
+
+    Les valeurs des questions à choix sont des listes de libellés, celles des
+    questions texte des chaînes ; `None` si la question n'a pas été répondue.
+    """
+    choice_texts = {
+        choice.id: choice.text
+        for question in questions
+        for choice in question.choices.all()
+    }
+    responses = (
+        Response.objects.filter(survey=survey)
+        .select_related('respondent')
+        .prefetch_related(Prefetch(
+            'answers',
+            queryset=Answer.objects.prefetch_related(
+                Prefetch('selected_choices', queryset=Choice.objects.only('id'))
+            )
+        ))
+        .order_by('id')
+    )
+
+    for response in responses.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        answers = {answer.question_id: answer for answer in response.answers.all()}
+        values = []
+        for question in questions:
+            answer = answers.get(question.id)
+            if answer is None:
+                values.append(None)
+            elif question.question_type == 'text':
+                values.append(answer.text_answer or '')
+            else:
+                values.append([choice_texts[choice.id] for choice in answer.selected_choices.all()])
+        yield response, values
+
+
+def stream_csv(survey, questions):
+    """Génère l'export CSV ligne par ligne (choix multiples séparés par « ; »)."""
+    writer = csv.writer(Echo())
+    yield writer.writerow(['id', 'participant', 'date'] + [question.text for question in questions])
+    for response, values in iter_response_rows(survey, questions):
+        yield writer.writerow(
+            [response.pk, response.participant_label, response.submitted_at.isoformat()]
+            + ['; '.join(value) if isinstance(value, list) else (value or '') for value in values]
+        )
+
+
+def stream_ndjson(survey, questions):
+    """Génère l'export NDJSON : un objet JSON par participation."""
+    for response, values in iter_response_rows(survey, questions):
+        yield json.dumps({
+            'id': response.pk,
+            'participant': response.participant_label,
+            'date': response.submitted_at.isoformat(),
+            'answers': {
+                str(question.id): value
+                for question, value in zip(questions, values)
+            },
+        }, ensure_ascii=False) + '\n'
+
+
+def stream_export(survey, export_format):
+    """Retourne le générateur d'export d'un sondage pour le format demandé."""
+    questions = list(survey.questions.prefetch_related('choices'))
+    if export_format == 'ndjson':
+        return stream_ndjson(survey, questions)
+    return stream_csv(survey, questions)
@@ -1,4 +1,5 @@
 from django import forms
+from django.db.models import Q
 from django.forms import inlineformset_factory
 from .models import Survey, Question, Choice, Response, Answer
 
@@ -111,6 +112,31 @@ ChoiceFormSet = inlineformset_factory(
 )
 
 
+class QuestionConditionsForm(forms.ModelForm):
+    """Conditions d'affichage d'une question : choix des questions précédentes qui la font apparaître"""
+    class Meta:
+        model = Question
+        fields = ['condition_choices']
+        widgets = {
+            'condition_choices': forms.CheckboxSelectMultiple(attrs={
+                'class': 'form-check-input'
+            }),
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        question = self.instance
+        field = self.fields['condition_choices']
+        field.queryset = Choice.objects.filter(
+            question__survey=question.survey_id
+        ).filter(
+            Q(question__order__lt=question.order) |
+            Q(question__order=question.order, question__id__lt=question.id)
+        ).select_related('question').order_by('question__order', 'question__id', 'order', 'id')
+        field.label_from_instance = lambda choice: f"{choice.question.text} : {choice.text}"
+        field.help_text = "Laissez vide pour toujours afficher la question."
+
+
 class SurveyPublishForm(forms.ModelForm):
     class Meta:
         model = Survey
@@ -141,6 +167,7 @@ class SurveyResponseForm(forms.ModelForm):
 
 
 class AnswerForm(forms.ModelForm):
+    """Réponse à une question, construite à partir du schéma compilé (sans requête)"""
     text_answer = forms.CharField(
         required=False,
         widget=forms.Textarea(attrs={
@@ -150,37 +177,39 @@ class AnswerForm(forms.ModelForm):
         })
     )
     
-    selected_choices = forms.ModelMultipleChoiceField(
-        queryset=Choice.objects.none(),
+    selected_choices = forms.TypedMultipleChoiceField(
+        coerce=int,
         required=False,
         widget=forms.CheckboxSelectMultiple(attrs={
             'class': 'form-check-input'
         })
     )
     
-    single_choice = forms.ModelChoiceField(
-        queryset=Choice.objects.none(),
+    single_choice = forms.TypedChoiceField(
+        coerce=int,
+        empty_value=None,
         required=False,
         widget=forms.RadioSelect(attrs={
             'class': 'form-check-input'
-        }),
-        empty_label=None
+        })
     )
 
     class Meta:
         model = Answer
-        fields = ['text_answer', 'selected_choices', 'single_choice']
+        fields = ['text_answer']
 
     def __init__(self, question, *args, **kwargs):
+        """`question` est un `QuestionSchema` (voir survey.schema)"""
         super().__init__(*args, **kwargs)
+        self.question = question
         if question.question_type in ['single', 'multiple']:
-            choices = question.choices.all()
+            choices = [(choice.id, choice.text) for choice in question.choices]
             if question.question_type == 'single':
-                self.fields['single_choice'].queryset = choices
+                self.fields['single_choice'].choices = choices
                 self.fields['single_choice'].required = question.required
                 del self.fields['selected_choices']
             else:  # multiple
-                self.fields['selected_choices'].queryset = choices
+                self.fields['selected_choices'].choices = choices
                 self.fields['selected_choices'].required = question.required
                 del self.fields['single_choice']
             del self.fields['text_answer']
@@ -193,6 +222,15 @@ class AnswerForm(forms.ModelForm):
         cleaned_data = super().clean()
         return cleaned_data
 
+    def get_selected_choices(self):
+        """Retourne la liste des choix sélectionnés (`ChoiceSchema`, vide pour une question texte)"""
+        if self.cleaned_data.get('selected_choices'):
+            choice_ids = set(self.cleaned_data['selected_choices'])
+            return [choice for choice in self.question.choices if choice.id in choice_ids]
+        if self.cleaned_data.get('single_choice') is not None:
+            return [self.question.get_choice(self.cleaned_data['single_choice'])]
+        return []
+
     def save(self, commit=True):
         instance = super().save(commit=False)
         if commit:
@@ -0,0 +1,139 @@
+"""Diffusion en direct des résultats par Server-Sent Events (ASGI).
+
+Chaque sondage suivi a un unique flux (`SurveyFeed`) par boucle d'événements :
+une seule tâche interroge la version des résultats à intervalle régulier et,
+quand elle change, relit les compteurs et diffuse les écarts par choix à tous
+les spectateurs connectés. Le coût en base ne dépend donc pas du nombre de
+spectateurs. La tâche s'arrête quand le dernier spectateur se déconnecte.
+"""
+import asyncio
+import json
+import logging
+
+from asgiref.sync import sync_to_async
+
+from .models import SurveyTally
+from .tallies import read_tallies
+
+logger = logging.getLogger(__name__)
+
+# Intervalle (secondes) entre deux lectures de la version des résultats
+LIVE_POLL_INTERVAL = 2
+
+# Intervalle (secondes) des commentaires envoyés pour garder la connexion ouverte
+LIVE_KEEPALIVE_INTERVAL = 15
+
+# Messages en attente par spectateur ; au-delà, le spectateur trop lent est
+# déconnecté et son navigateur se reconnecte en recevant un nouvel état complet
+LIVE_QUEUE_SIZE = 50
+
+_feeds = {}
+
+
+def sse_event(event, data):
+    """Formate un événement Server-Sent Events."""
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
+
+class SurveyFeed:
+    """Flux partagé des résultats d'un sondage entre tous ses spectateurs."""
+
+    def __init__(self, key, survey):
+        self.key = key
+        self.survey = survey
+        self.subscribers = set()
+        self.version = None
+        self.participants = 0
+        self.choice_counts = {}
+        self.ready = asyncio.Event()
+        self.task = None
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=LIVE_QUEUE_SIZE)
+        self.subscribers.add(queue)
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+        return queue
+
+    def unsubscribe(self, queue):
+        self.subscribers.discard(queue)
+        if not self.subscribers:
+            self.task.cancel()
+            if _feeds.get(self.key) is self:
+                del _feeds[self.key]
+
+    def snapshot(self):
+        return {
+            'version': self.version,
+            'participants': self.participants,
+            'choices': {str(choice_id): count for choice_id, count in self.choice_counts.items()},
+        }
+
+    async def run(self):
+        while True:
+            try:
+                await self.refresh()
+            except Exception:
+                logger.exception("Lecture des résultats en direct du sondage #%s impossible", self.survey.pk)
+            self.ready.set()
+            await asyncio.sleep(LIVE_POLL_INTERVAL)
+
+    async def refresh(self):
+        """Relit les compteurs si la version des résultats a changé et diffuse les écarts."""
+        version = await SurveyTally.objects.filter(survey=self.survey).values_list('version', flat=True).afirst()
+        if version == self.version:
+            return
+        participants, _, choice_counts = await sync_to_async(read_tallies)(self.survey)
+        deltas = {
+            str(choice_id): choice_counts.get(choice_id, 0) - self.choice_counts.get(choice_id, 0)
+            for choice_id in set(choice_counts) | set(self.choice_counts)
+            if choice_counts.get(choice_id, 0) != self.choice_counts.get(choice_id, 0)
+        }
+        participants_delta = participants - self.participants
+        first_read = self.version is None
+        self.version, self.participants, self.choice_counts = version, participants, choice_counts
+        if first_read or not (deltas or participants_delta):
+            return
+
+        message = sse_event('delta', {
+            'version': version,
+            'participants': participants,
+            'participants_delta': participants_delta,
+            'choices': deltas,
+        })
+        for queue in list(self.subscribers):
+            try:
+                queue.put_nowait(message)
+            except asyncio.QueueFull:
+                # Spectateur trop lent : fin de son flux, il se reconnectera
+                self.subscribers.discard(queue)
+                queue.get_nowait()
+                queue.put_nowait(None)
+
+
+def get_feed(survey):
+    """Flux du sondage pour la boucle d'événements courante, créé au besoin."""
+    key = (asyncio.get_running_loop(), survey.pk)
+    if key not in _feeds:
+        _feeds[key] = SurveyFeed(key, survey)
+    return _feeds[key]
+
+
+async def live_events(survey):
+    """Événements envoyés à un spectateur : l'état complet, puis les écarts."""
+    feed = get_feed(survey)
+    queue = feed.subscribe()
+    try:
+        await feed.ready.wait()
+        yield 'retry: 5000\n' + sse_event('snapshot', feed.snapshot())
+        while True:
+            try:
+                message = await asyncio.wait_for(queue.get(), LIVE_KEEPALIVE_INTERVAL)
+            except asyncio.TimeoutError:
+                yield ': keepalive\n\n'
+                continue
+            if message is None:
+                break
+            yield message
+    finally:
+        feed.unsubscribe(queue)
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from survey.models import Survey, bump_results_version
+from survey.results import aggregate_counts
+from survey.tallies import (
+    check_buckets, check_tallies, check_terms, count_buckets, count_terms,
+    rebuild_buckets, rebuild_tallies, rebuild_terms,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Reconstruit (ou vérifie avec --check) les compteurs de résultats, les compteurs "
+        "horaires et les fréquences de termes à partir des réponses brutes."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('survey_ids', nargs='*', type=int, help="Sondages à traiter (tous par défaut).")
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help="Vérifie les compteurs sans les modifier et échoue en cas d'écart.",
+        )
+
+    def handle(self, *args, **options):
+        surveys = Survey.objects.order_by('pk')
+        if options['survey_ids']:
+            surveys = surveys.filter(pk__in=options['survey_ids'])
+
+        mismatches = 0
+        for survey in surveys.iterator():
+            counts = aggregate_counts(survey)
+            term_counts = count_terms(survey)
+            bucket_counts = count_buckets(survey)
+            if options['check']:
+                errors = (
+                    check_tallies(survey, counts)
+                    + check_buckets(survey, bucket_counts)
+                    + check_terms(survey, term_counts)
+                )
+                for error in errors:
+                    self.stdout.write(f"Sondage #{survey.pk} — {error}")
+                mismatches += bool(errors)
+            else:
+                rebuild_tallies(survey, counts)
+                rebuild_buckets(survey, bucket_counts)
+                rebuild_terms(survey, term_counts)
+                # Les résultats en cache reposaient sur les anciens compteurs
+                bump_results_version(survey=survey)
+                self.stdout.write(f"Sondage #{survey.pk} : compteurs reconstruits.")
+
+        if mismatches:
+            raise CommandError(f"{mismatches} sondage(s) avec des compteurs incohérents.")
+        if options['check']:
+            self.stdout.write(self.style.SUCCESS("Tous les compteurs sont cohérents."))
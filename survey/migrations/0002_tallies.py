@@ -0,0 +1,88 @@
+# Generated by Django 5.1.6 on 2026-10-18 10:43
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count
+
+
+def backfill_tallies(apps, schema_editor):
+    """Initialise les compteurs à partir des réponses déjà enregistrées."""
+    Survey = apps.get_model('survey', 'Survey')
+    Response = apps.get_model('survey', 'Response')
+    Answer = apps.get_model('survey', 'Answer')
+    Question = apps.get_model('survey', 'Question')
+    Choice = apps.get_model('survey', 'Choice')
+    SurveyTally = apps.get_model('survey', 'SurveyTally')
+    QuestionTally = apps.get_model('survey', 'QuestionTally')
+    ChoiceTally = apps.get_model('survey', 'ChoiceTally')
+
+    participants = dict(
+        Response.objects.values('survey_id').annotate(total=Count('id')).values_list('survey_id', 'total')
+    )
+    question_counts = dict(
+        Answer.objects.values('question_id').annotate(total=Count('id')).values_list('question_id', 'total')
+    )
+    choice_counts = dict(
+        Answer.selected_choices.through.objects.values('choice_id')
+        .annotate(total=Count('id'))
+        .values_list('choice_id', 'total')
+    )
+
+    SurveyTally.objects.bulk_create([
+        SurveyTally(survey_id=survey_id, participants=participants.get(survey_id, 0))
+        for survey_id in Survey.objects.values_list('id', flat=True)
+    ])
+    QuestionTally.objects.bulk_create([
+        QuestionTally(question_id=question_id, survey_id=survey_id, answers=question_counts.get(question_id, 0))
+        for question_id, survey_id in Question.objects.values_list('id', 'survey_id')
+    ])
+    ChoiceTally.objects.bulk_create([
+        ChoiceTally(choice_id=choice_id, survey_id=survey_id, count=choice_counts.get(choice_id, 0))
+        for choice_id, survey_id in Choice.objects.values_list('id', 'question__survey_id')
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SurveyTally',
+            fields=[
+                ('survey', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='tally', serialize=False, to='survey.survey')),
+                ('participants', models.PositiveIntegerField(default=0, verbose_name='Participants')),
+            ],
+            options={
+                'verbose_name': 'Compteur de sondage',
+                'verbose_name_plural': 'Compteurs de sondages',
+            },
+        ),
+        migrations.CreateModel(
+            name='ChoiceTally',
+            fields=[
+                ('choice', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='tally', serialize=False, to='survey.choice')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Sélections')),
+                ('survey', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='choice_tallies', to='survey.survey')),
+            ],
+            options={
+                'verbose_name': 'Compteur de choix',
+                'verbose_name_plural': 'Compteurs de choix',
+            },
+        ),
+        migrations.CreateModel(
+            name='QuestionTally',
+            fields=[
+                ('question', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='tally', serialize=False, to='survey.question')),
+                ('answers', models.PositiveIntegerField(default=0, verbose_name='Réponses')),
+                ('survey', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='question_tallies', to='survey.survey')),
+            ],
+            options={
+                'verbose_name': 'Compteur de question',
+                'verbose_name_plural': 'Compteurs de questions',
+            },
+        ),
+        migrations.RunPython(backfill_tallies, migrations.RunPython.noop),
+    ]
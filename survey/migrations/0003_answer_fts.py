@@ -0,0 +1,75 @@
+from django.db import migrations
+
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE survey_answer_fts USING fts5(
+        text_answer,
+        content='survey_answer',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    """
+    CREATE TRIGGER survey_answer_fts_insert AFTER INSERT ON survey_answer BEGIN
+        INSERT INTO survey_answer_fts(rowid, text_answer)
+        SELECT new.id, new.text_answer WHERE new.text_answer IS NOT NULL AND new.text_answer != '';
+    END
+    """,
+    """
+    CREATE TRIGGER survey_answer_fts_delete AFTER DELETE ON survey_answer BEGIN
+        INSERT INTO survey_answer_fts(survey_answer_fts, rowid, text_answer)
+        SELECT 'delete', old.id, old.text_answer WHERE old.text_answer IS NOT NULL AND old.text_answer != '';
+    END
+    """,
+    """
+    CREATE TRIGGER survey_answer_fts_update AFTER UPDATE OF text_answer ON survey_answer BEGIN
+        INSERT INTO survey_answer_fts(survey_answer_fts, rowid, text_answer)
+        SELECT 'delete', old.id, old.text_answer WHERE old.text_answer IS NOT NULL AND old.text_answer != '';
+        INSERT INTO survey_answer_fts(rowid, text_answer)
+        SELECT new.id, new.text_answer WHERE new.text_answer IS NOT NULL AND new.text_answer != '';
+    END
+    """,
+    """
+    INSERT INTO survey_answer_fts(rowid, text_answer)
+    SELECT id, text_answer FROM survey_answer WHERE text_answer IS NOT NULL AND text_answer != ''
+    """,
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS survey_answer_fts_insert",
+    "DROP TRIGGER IF EXISTS survey_answer_fts_delete",
+    "DROP TRIGGER IF EXISTS survey_answer_fts_update",
+    "DROP TABLE IF EXISTS survey_answer_fts",
+]
+
+
+def fts5_supported(connection):
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def create_answer_index(apps, schema_editor):
+    """Index FTS5 des réponses texte (SQLite uniquement, sinon repli sur icontains)."""
+    if fts5_supported(schema_editor.connection):
+        for statement in CREATE_SQL:
+            schema_editor.execute(statement)
+
+
+def drop_answer_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in DROP_SQL:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0002_tallies'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_answer_index, drop_answer_index),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.1.6 on 2026-10-18 10:51
+
+import django.db.models.deletion
+from collections import Counter
+
+from django.db import migrations, models
+
+from survey.textstats import extract_terms
+
+
+def backfill_term_counts(apps, schema_editor):
+    """Calcule les fréquences de termes des réponses texte déjà enregistrées."""
+    Answer = apps.get_model('survey', 'Answer')
+    TermCount = apps.get_model('survey', 'TermCount')
+
+    counts = Counter()
+    answers = Answer.objects.filter(question__question_type='text').exclude(text_answer__isnull=True)
+    for question_id, text in answers.values_list('question_id', 'text_answer').iterator():
+        counts.update((question_id, term) for term in extract_terms(text))
+    TermCount.objects.bulk_create([
+        TermCount(question_id=question_id, term=term, count=count)
+        for (question_id, term), count in counts.items()
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0003_answer_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TermCount',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('term', models.CharField(max_length=100, verbose_name='Terme')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Réponses contenant le terme')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='term_counts', to='survey.question')),
+            ],
+            options={
+                'verbose_name': 'Fréquence de terme',
+                'verbose_name_plural': 'Fréquences de termes',
+                'indexes': [models.Index(fields=['question', '-count'], name='survey_term_top_idx')],
+                'unique_together': {('question', 'term')},
+            },
+        ),
+        migrations.RunPython(backfill_term_counts, migrations.RunPython.noop),
+    ]
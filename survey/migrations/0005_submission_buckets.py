@@ -0,0 +1,99 @@
+# Generated by Django 5.1.6 on 2026-10-18 10:53
+
+import django.db.models.deletion
+from datetime import timezone
+
+from django.db import migrations, models
+from django.db.models import Count
+from django.db.models.functions import TruncHour
+
+
+def backfill_buckets(apps, schema_editor):
+    """Initialise les compteurs horaires à partir des dates de soumission existantes."""
+    Response = apps.get_model('survey', 'Response')
+    Answer = apps.get_model('survey', 'Answer')
+    ParticipationBucket = apps.get_model('survey', 'ParticipationBucket')
+    QuestionBucket = apps.get_model('survey', 'QuestionBucket')
+    ChoiceBucket = apps.get_model('survey', 'ChoiceBucket')
+
+    ParticipationBucket.objects.bulk_create([
+        ParticipationBucket(survey_id=survey_id, hour=hour, count=total)
+        for survey_id, hour, total in Response.objects
+        .annotate(bucket=TruncHour('submitted_at', tzinfo=timezone.utc))
+        .values('survey_id', 'bucket')
+        .annotate(total=Count('id'))
+        .values_list('survey_id', 'bucket', 'total')
+    ], batch_size=500)
+    QuestionBucket.objects.bulk_create([
+        QuestionBucket(question_id=question_id, survey_id=survey_id, hour=hour, count=total)
+        for question_id, survey_id, hour, total in Answer.objects
+        .annotate(bucket=TruncHour('response__submitted_at', tzinfo=timezone.utc))
+        .values('question_id', 'response__survey_id', 'bucket')
+        .annotate(total=Count('id'))
+        .values_list('question_id', 'response__survey_id', 'bucket', 'total')
+    ], batch_size=500)
+    ChoiceBucket.objects.bulk_create([
+        ChoiceBucket(choice_id=choice_id, survey_id=survey_id, hour=hour, count=total)
+        for choice_id, survey_id, hour, total in Answer.selected_choices.through.objects
+        .annotate(bucket=TruncHour('answer__response__submitted_at', tzinfo=timezone.utc))
+        .values('choice_id', 'answer__response__survey_id', 'bucket')
+        .annotate(total=Count('id'))
+        .values_list('choice_id', 'answer__response__survey_id', 'bucket', 'total')
+    ], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0004_term_counts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChoiceBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField(verbose_name='Heure (UTC)')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Sélections')),
+                ('choice', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='buckets', to='survey.choice')),
+                ('survey', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='choice_buckets', to='survey.survey')),
+            ],
+            options={
+                'verbose_name': 'Sélections par heure',
+                'verbose_name_plural': 'Sélections par heure',
+                'indexes': [models.Index(fields=['survey', 'hour'], name='survey_cbucket_window_idx')],
+                'unique_together': {('choice', 'hour')},
+            },
+        ),
+        migrations.CreateModel(
+            name='ParticipationBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField(verbose_name='Heure (UTC)')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Participations')),
+                ('survey', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='participation_buckets', to='survey.survey')),
+            ],
+            options={
+                'verbose_name': 'Participations par heure',
+                'verbose_name_plural': 'Participations par heure',
+                'unique_together': {('survey', 'hour')},
+            },
+        ),
+        migrations.CreateModel(
+            name='QuestionBucket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('hour', models.DateTimeField(verbose_name='Heure (UTC)')),
+                ('count', models.PositiveIntegerField(default=0, verbose_name='Réponses')),
+                ('question', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='buckets', to='survey.question')),
+                ('survey', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='question_buckets', to='survey.survey')),
+            ],
+            options={
+                'verbose_name': 'Réponses par heure',
+                'verbose_name_plural': 'Réponses par heure',
+                'indexes': [models.Index(fields=['survey', 'hour'], name='survey_qbucket_window_idx')],
+                'unique_together': {('question', 'hour')},
+            },
+        ),
+        migrations.RunPython(backfill_buckets, migrations.RunPython.noop),
+    ]
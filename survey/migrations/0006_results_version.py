@@ -0,0 +1,35 @@
+# Generated by Django 5.1.6 on 2026-10-18 10:56
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def create_missing_tallies(apps, schema_editor):
+    """Crée le compteur des sondages qui n'ont encore reçu aucune participation."""
+    Survey = apps.get_model('survey', 'Survey')
+    SurveyTally = apps.get_model('survey', 'SurveyTally')
+    SurveyTally.objects.bulk_create([
+        SurveyTally(survey_id=survey_id)
+        for survey_id in Survey.objects.filter(tally__isnull=True).values_list('id', flat=True)
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0005_submission_buckets'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='surveytally',
+            name='updated_at',
+            field=models.DateTimeField(default=django.utils.timezone.now, verbose_name='Résultats modifiés le'),
+        ),
+        migrations.AddField(
+            model_name='surveytally',
+            name='version',
+            field=models.PositiveIntegerField(default=0, verbose_name='Version des résultats'),
+        ),
+        migrations.RunPython(create_missing_tallies, migrations.RunPython.noop),
+    ]
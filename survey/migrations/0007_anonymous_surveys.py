@@ -0,0 +1,35 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:21
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0006_results_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='response',
+            name='respondent_token',
+            field=models.CharField(blank=True, max_length=64, null=True, verbose_name='Jeton du participant anonyme'),
+        ),
+        migrations.AddField(
+            model_name='survey',
+            name='anonymous',
+            field=models.BooleanField(default=False, help_text='Ouvert sans compte : chaque participant est reconnu par un cookie signé.', verbose_name='Sondage public anonyme'),
+        ),
+        migrations.AlterField(
+            model_name='response',
+            name='respondent',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='survey_responses', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='response',
+            constraint=models.UniqueConstraint(condition=models.Q(('respondent_token__isnull', False)), fields=('survey', 'respondent_token'), name='survey_response_unique_token'),
+        ),
+    ]
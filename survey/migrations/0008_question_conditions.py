@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0007_anonymous_surveys'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='question',
+            name='condition_choices',
+            field=models.ManyToManyField(blank=True, related_name='dependent_questions', to='survey.choice', verbose_name="Afficher si l'un de ces choix est sélectionné"),
+        ),
+    ]
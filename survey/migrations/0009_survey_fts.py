@@ -0,0 +1,74 @@
+from django.db import migrations
+
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE survey_survey_fts USING fts5(
+        title,
+        description,
+        content='survey_survey',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER survey_survey_fts_insert AFTER INSERT ON survey_survey BEGIN
+        INSERT INTO survey_survey_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    """
+    CREATE TRIGGER survey_survey_fts_delete AFTER DELETE ON survey_survey BEGIN
+        INSERT INTO survey_survey_fts(survey_survey_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+    END
+    """,
+    """
+    CREATE TRIGGER survey_survey_fts_update AFTER UPDATE OF title, description ON survey_survey BEGIN
+        INSERT INTO survey_survey_fts(survey_survey_fts, rowid, title, description)
+        VALUES ('delete', old.id, old.title, old.description);
+        INSERT INTO survey_survey_fts(rowid, title, description)
+        VALUES (new.id, new.title, new.description);
+    END
+    """,
+    "INSERT INTO survey_survey_fts(survey_survey_fts) VALUES ('rebuild')",
+]
+
+DROP_SQL = [
+    "DROP TRIGGER IF EXISTS survey_survey_fts_insert",
+    "DROP TRIGGER IF EXISTS survey_survey_fts_delete",
+    "DROP TRIGGER IF EXISTS survey_survey_fts_update",
+    "DROP TABLE IF EXISTS survey_survey_fts",
+]
+
+
+def fts5_supported(connection):
+    if connection.vendor != 'sqlite':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        return bool(cursor.fetchone()[0])
+
+
+def create_survey_index(apps, schema_editor):
+    """Index FTS5 des titres et descriptions des sondages (SQLite uniquement, sinon repli sur icontains)."""
+    if fts5_supported(schema_editor.connection):
+        for statement in CREATE_SQL:
+            schema_editor.execute(statement)
+
+
+def drop_survey_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for statement in DROP_SQL:
+            schema_editor.execute(statement)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0008_question_conditions'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_survey_index, drop_survey_index),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:40
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0009_survey_fts'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='survey',
+            index=models.Index(fields=['created_at', 'id'], name='survey_created_idx'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.1.6 on 2026-10-18 11:42
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('survey', '0010_survey_created_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='survey',
+            index=models.Index(fields=['status', 'start_date', 'end_date'], name='survey_status_dates_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='survey',
+            index=models.Index(fields=['creator', 'created_at'], name='survey_creator_created_idx'),
+        ),
+        # Réponses ayant sélectionné un choix : l'index couvre la jointure sans lire la table
+        migrations.RunSQL(
+            'CREATE INDEX survey_answer_choices_choice_answer_idx'
+            ' ON survey_answer_selected_choices (choice_id, answer_id)',
+            'DROP INDEX survey_answer_choices_choice_answer_idx',
+        ),
+    ]
@@ -17,15 +17,36 @@ class Survey(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     creator = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='created_surveys')
     status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='draft', verbose_name="Statut")
+    anonymous = models.BooleanField(
+        default=False,
+        verbose_name="Sondage public anonyme",
+        help_text="Ouvert sans compte : chaque participant est reconnu par un cookie signé."
+    )
 
     class Meta:
         verbose_name = "Sondage"
         verbose_name_plural = "Sondages"
         ordering = ['-created_at']
+        indexes = [
+            # Pagination par curseur des listes (voir survey.pagination)
+            models.Index(fields=['created_at', 'id'], name='survey_created_idx'),
+            # Sondages actifs : statut puis période de participation
+            models.Index(fields=['status', 'start_date', 'end_date'], name='survey_status_dates_idx'),
+            # Sondages d'un créateur, du plus récent au plus ancien
+            models.Index(fields=['creator', 'created_at'], name='survey_creator_created_idx'),
+        ]
 
     def __str__(self):
         return self.title
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Statut chargé, pour ajuster les compteurs par statut à l'enregistrement
+        if 'status' in field_names:
+            instance._loaded_status = instance.status
+        return instance
+    
     def get_absolute_url(self):
         return reverse('surveys:survey_detail', args=[self.pk])
     
@@ -66,6 +87,13 @@ class Question(models.Model):
     question_type = models.CharField(max_length=10, choices=QUESTION_TYPES, verbose_name="Type de question")
     required = models.BooleanField(default=False, verbose_name="Obligatoire")
     order = models.PositiveIntegerField(default=0, verbose_name="Ordre")
+    # Question affichée seulement si l'un de ces choix d'une question précédente est sélectionné
+    condition_choices = models.ManyToManyField(
+        'Choice',
+        blank=True,
+        related_name='dependent_questions',
+        verbose_name="Afficher si l'un de ces choix est sélectionné"
+    )
     
     class Meta:
         verbose_name = "Question"
@@ -92,16 +120,36 @@ class Choice(models.Model):
 
 class Response(models.Model):
     survey = models.ForeignKey(Survey, on_delete=models.CASCADE, related_name='responses')
-    respondent = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name='survey_responses')
+    # Participant connecté, ou jeton anonyme pour les sondages publics
+    respondent = models.ForeignKey(
+        settings.AUTH_USER_MODEL,
+        on_delete=models.CASCADE,
+        related_name='survey_responses',
+        null=True,
+        blank=True
+    )
+    respondent_token = models.CharField(max_length=64, null=True, blank=True, verbose_name="Jeton du participant anonyme")
     submitted_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
         verbose_name = "Réponse au sondage"
         verbose_name_plural = "Réponses aux sondages"
         unique_together = ('survey', 'respondent')
+        constraints = [
+            # Une seule participation par jeton ; l'index sert aussi à la détection des doublons
+            models.UniqueConstraint(
+                fields=['survey', 'respondent_token'],
+                condition=models.Q(respondent_token__isnull=False),
+                name='survey_response_unique_token',
+            ),
+        ]
+    
+    @property
+    def participant_label(self):
+        return self.respondent.username if self.respondent_id else "Anonyme"
     
     def __str__(self):
-        return f"Réponse de {self.respondent.username} au sondage '{self.survey.title}'"
+        return f"Réponse de {self.participant_label} au sondage '{self.survey.title}'"
 
 
 class Answer(models.Model):
@@ -116,4 +164,216 @@ class Answer(models.Model):
         unique_together = ('response', 'question')
     
     def __str__(self):
-        return f"Réponse à la question '{self.question.text}'"
\ No newline at end of file
+        return f"Réponse à la question '{self.question.text}'"
+
+class SurveyTally(models.Model):
+    survey = models.OneToOneField(Survey, on_delete=models.CASCADE, primary_key=True, related_name='tally')
+    participants = models.PositiveIntegerField(default=0, verbose_name="Participants")
+    # Incrémentée à chaque changement des résultats : clé des résultats en cache
+    version = models.PositiveIntegerField(default=0, verbose_name="Version des résultats")
+    updated_at = models.DateTimeField(default=timezone.now, verbose_name="Résultats modifiés le")
+
+    class Meta:
+        verbose_name = "Compteur de sondage"
+        verbose_name_plural = "Compteurs de sondages"
+
+    def __str__(self):
+        return f"{self.participants} participant(s) au sondage #{self.survey_id}"
+
+
+class QuestionTally(models.Model):
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, primary_key=True, related_name='tally')
+    survey = models.ForeignKey(Survey, on_delete=models.CASCADE, related_name='question_tallies')
+    answers = models.PositiveIntegerField(default=0, verbose_name="Réponses")
+
+    class Meta:
+        verbose_name = "Compteur de question"
+        verbose_name_plural = "Compteurs de questions"
+
+    def __str__(self):
+        return f"{self.answers} réponse(s) à la question #{self.question_id}"
+
+
+class ChoiceTally(models.Model):
+    choice = models.OneToOneField(Choice, on_delete=models.CASCADE, primary_key=True, related_name='tally')
+    survey = models.ForeignKey(Survey, on_delete=models.CASCADE, related_name='choice_tallies')
+    count = models.PositiveIntegerField(default=0, verbose_name="Sélections")
+
+    class Meta:
+        verbose_name = "Compteur de choix"
+        verbose_name_plural = "Compteurs de choix"
+
+    def __str__(self):
+        return f"{self.count} sélection(s) du choix #{self.choice_id}"
+
+
+class TermCount(models.Model):
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='term_counts')
+    term = models.CharField(max_length=100, verbose_name="Terme")
+    count = models.PositiveIntegerField(default=0, verbose_name="Réponses contenant le terme")
+
+    class Meta:
+        verbose_name = "Fréquence de terme"
+        verbose_name_plural = "Fréquences de termes"
+        unique_together = ('question', 'term')
+        indexes = [
+            models.Index(fields=['question', '-count'], name='survey_term_top_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.term} ({self.count})"
+
+
+class ParticipationBucket(models.Model):
+    survey = models.ForeignKey(Survey, on_delete=models.CASCADE, related_name='participation_buckets')
+    hour = models.DateTimeField(verbose_name="Heure (UTC)")
+    count = models.PositiveIntegerField(default=0, verbose_name="Participations")
+
+    class Meta:
+        verbose_name = "Participations par heure"
+        verbose_name_plural = "Participations par heure"
+        unique_together = ('survey', 'hour')
+
+    def __str__(self):
+        return f"{self.count} participation(s) au sondage #{self.survey_id} à {self.hour:%Y-%m-%d %H:00}"
+
+
+class QuestionBucket(models.Model):
+    question = models.ForeignKey(Question, on_delete=models.CASCADE, related_name='buckets')
+    survey = models.ForeignKey(Survey, on_delete=models.CASCADE, related_name='question_buckets')
+    hour = models.DateTimeField(verbose_name="Heure (UTC)")
+    count = models.PositiveIntegerField(default=0, verbose_name="Réponses")
+
+    class Meta:
+        verbose_name = "Réponses par heure"
+        verbose_name_plural = "Réponses par heure"
+        unique_together = ('question', 'hour')
+        indexes = [
+            models.Index(fields=['survey', 'hour'], name='survey_qbucket_window_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.count} réponse(s) à la question #{self.question_id} à {self.hour:%Y-%m-%d %H:00}"
+
+
+class ChoiceBucket(models.Model):
+    choice = models.ForeignKey(Choice, on_delete=models.CASCADE, related_name='buckets')
+    survey = models.ForeignKey(Survey, on_delete=models.CASCADE, related_name='choice_buckets')
+    hour = models.DateTimeField(verbose_name="Heure (UTC)")
+    count = models.PositiveIntegerField(default=0, verbose_name="Sélections")
+
+    class Meta:
+        verbose_name = "Sélections par heure"
+        verbose_name_plural = "Sélections par heure"
+        unique_together = ('choice', 'hour')
+        indexes = [
+            models.Index(fields=['survey', 'hour'], name='survey_cbucket_window_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.count} sélection(s) du choix #{self.choice_id} à {self.hour:%Y-%m-%d %H:00}"
+
+
+# Signaux pour invalider les résultats et les schémas en cache quand les données changent
+from django.db.models import F, QuerySet
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from .availability import forget_participations, invalidate_active_surveys, remember_participations
+from .counters import adjust_status_count
+
+
+def bump_results_version(**lookup):
+    """Change la version des résultats des sondages correspondant à `lookup`."""
+    SurveyTally.objects.filter(**lookup).update(version=F('version') + 1, updated_at=timezone.now())
+
+
+def touch_surveys(**lookup):
+    """Met à jour la date de modification des sondages dont une question ou un choix a changé."""
+    Survey.objects.filter(**lookup).update(updated_at=timezone.now())
+
+
+@receiver(post_save, sender=Survey)
+def create_survey_tally(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        SurveyTally.objects.get_or_create(survey=instance)
+
+
+@receiver(post_save, sender=Survey)
+def survey_status_saved(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    previous = None if created else getattr(instance, '_loaded_status', instance.status)
+    if previous != instance.status:
+        if previous is not None:
+            transaction.on_commit(lambda: adjust_status_count(previous, -1))
+        status = instance.status
+        transaction.on_commit(lambda: adjust_status_count(status, 1))
+    instance._loaded_status = instance.status
+
+
+@receiver(post_delete, sender=Survey)
+def survey_deleted(sender, instance, **kwargs):
+    status = getattr(instance, '_loaded_status', instance.status)
+    transaction.on_commit(lambda: adjust_status_count(status, -1))
+
+
+@receiver([post_save, post_delete], sender=Survey)
+def survey_catalog_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        transaction.on_commit(invalidate_active_surveys)
+
+
+@receiver(post_save, sender=Response)
+def response_created(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and instance.respondent_id:
+        pair = (instance.respondent_id, instance.survey_id)
+        transaction.on_commit(lambda: remember_participations([pair]))
+
+
+@receiver(pre_delete, sender=Response)
+def response_deleting(sender, instance, origin=None, **kwargs):
+    # Suppression directe ou en cascade (participant supprimé) : les compteurs sont
+    # ajustés dans la même transaction. Inutile si le sondage entier est supprimé.
+    if isinstance(origin, Survey) or (isinstance(origin, QuerySet) and origin.model is Survey):
+        return
+    from .tallies import retract_submission
+
+    retract_submission(instance)
+
+
+@receiver(post_delete, sender=Response)
+def response_deleted(sender, instance, **kwargs):
+    if instance.respondent_id:
+        user_id = instance.respondent_id
+        transaction.on_commit(lambda: forget_participations(user_id))
+
+
+@receiver([post_save, post_delete], sender=Response)
+def response_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_results_version(survey_id=instance.survey_id)
+
+
+@receiver([post_save, post_delete], sender=Question)
+def question_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_results_version(survey_id=instance.survey_id)
+        touch_surveys(pk=instance.survey_id)
+
+
+@receiver([post_save, post_delete], sender=Choice)
+def choice_changed(sender, instance, raw=False, **kwargs):
+    if not raw:
+        bump_results_version(survey__questions=instance.question_id)
+        touch_surveys(questions=instance.question_id)
+
+
+@receiver(m2m_changed, sender=Question.condition_choices.through)
+def question_conditions_changed(sender, instance, action, reverse, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        if reverse:
+            touch_surveys(questions__choices=instance.pk)
+        else:
+            touch_surveys(pk=instance.survey_id)
@@ -0,0 +1,141 @@
+"""Pagination par curseur (« keyset ») des listes de sondages.
+
+Les sondages sont parcourus dans l'ordre (created_at, id) décroissant. Au
+lieu d'un numéro de page traduit en OFFSET, chaque lien porte un curseur
+opaque et signé qui désigne le dernier (ou le premier) sondage affiché : la
+page suivante est lue avec `WHERE (created_at, id) < curseur`, sur l'index
+(created_at, id). La page N coûte donc autant que la première, et aucun
+COUNT n'est nécessaire pour savoir s'il existe une page suivante.
+
+Les résultats d'une recherche classés par pertinence ne suivent pas cet
+ordre : leur curseur porte une position. La correspondance plein texte
+évalue de toute façon toutes les lignes trouvées pour les classer.
+"""
+from datetime import datetime
+
+from django.core import signing
+from django.db.models import Q
+
+CURSOR_SALT = 'survey-list-cursor'
+
+
+class KeysetPage:
+    """Page de résultats avec les curseurs des pages voisines (None s'il n'y en a pas)."""
+
+    def __init__(self, object_list, next_cursor=None, previous_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+
+def encode_cursor(direction, position):
+    return signing.dumps([direction, position], salt=CURSOR_SALT)
+
+
+def decode_cursor(token):
+    """(sens, position) d'un curseur, ou (None, None) s'il est absent ou invalide."""
+    if not token:
+        return None, None
+    try:
+        direction, position = signing.loads(token, salt=CURSOR_SALT)
+    except (signing.BadSignature, TypeError, ValueError):
+        return None, None
+    return direction, position
+
+
+def survey_key(survey):
+    return [survey.created_at.isoformat(), survey.pk]
+
+
+def keyset_page(queryset, cursor, per_page):
+    """Page de sondages ordonnés par (created_at, id) décroissants, à partir du curseur `cursor`."""
+    direction, position = decode_cursor(cursor)
+    if direction not in ('next', 'previous'):
+        direction, position = 'next', None
+    base = queryset
+
+    if position is None:
+        queryset = queryset.order_by('-created_at', '-id')
+    else:
+        created_at, pk = datetime.fromisoformat(position[0]), position[1]
+        if direction == 'next':
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) | Q(created_at=created_at, id__lt=pk)
+            ).order_by('-created_at', '-id')
+        else:
+            queryset = queryset.filter(
+                Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+            ).order_by('created_at', 'id')
+
+    rows = list(queryset[:per_page + 1])
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if direction == 'previous':
+        rows.reverse()
+        has_next, has_previous = True, has_more
+    else:
+        has_next, has_previous = has_more, position is not None
+    if not rows:
+        # Plus rien avant le curseur (sondages supprimés) : retour à la première page
+        return keyset_page(base, None, per_page) if direction == 'previous' else KeysetPage(rows)
+    return KeysetPage(
+        rows,
+        encode_cursor('next', survey_key(rows[-1])) if has_next else None,
+        encode_cursor('previous', survey_key(rows[0])) if has_previous else None,
+    )
+
+
+def keyset_list_page(surveys, cursor, per_page):
+    """Comme `keyset_page`, pour une liste de sondages déjà triée en mémoire (voir survey.availability)."""
+    direction, position = decode_cursor(cursor)
+    if direction not in ('next', 'previous') or position is None:
+        direction, position = 'next', None
+    key = None if position is None else (datetime.fromisoformat(position[0]), position[1])
+
+    def first_index(condition):
+        return next((i for i, survey in enumerate(surveys) if condition((survey.created_at, survey.pk))), len(surveys))
+
+    if direction == 'previous':
+        end = first_index(lambda survey_key: survey_key <= key)
+        start = max(end - per_page, 0)
+        if start == end:
+            return keyset_list_page(surveys, None, per_page)
+        rows, has_previous, has_next = surveys[start:end], start > 0, True
+    else:
+        start = 0 if key is None else first_index(lambda survey_key: survey_key < key)
+        rows = surveys[start:start + per_page]
+        has_previous, has_next = key is not None, start + per_page < len(surveys)
+    if not rows:
+        return KeysetPage(rows)
+    return KeysetPage(
+        rows,
+        encode_cursor('next', survey_key(rows[-1])) if has_next else None,
+        encode_cursor('previous', survey_key(rows[0])) if has_previous else None,
+    )
+
+
+def ranked_page(queryset, cursor, per_page):
+    """Page de résultats dans l'ordre de `queryset` (pertinence), le curseur portant une position."""
+    direction, position = decode_cursor(cursor)
+    offset = position if direction == 'offset' and isinstance(position, int) and position > 0 else 0
+    rows = list(queryset[offset:offset + per_page + 1])
+    has_next = len(rows) > per_page
+    return KeysetPage(
+        rows[:per_page],
+        encode_cursor('offset', offset + per_page) if has_next else None,
+        encode_cursor('offset', max(offset - per_page, 0)) if offset else None,
+    )
@@ -0,0 +1,255 @@
+"""Calcul des statistiques de résultats d'un sondage.
+
+Toutes les fonctions travaillent sur le sondage entier avec un nombre fixe de
+requêtes groupées, quel que soit le nombre de questions ou de choix. La
+structure `questions_stats` produite est partagée par la page de résultats,
+l'export et l'API.
+"""
+from collections import defaultdict
+from hashlib import md5
+
+from django.db import connection
+from django.db.models import Count
+
+from .models import Answer, Choice, Response
+from .tallies import read_tallies, read_top_terms, read_window_tallies
+
+# Nombre de réponses texte affichées par question et renvoyées par page
+TEXT_ANSWERS_PAGE_SIZE = 20
+
+# Questions texte dont les premières pages sont lues par une même requête
+TEXT_QUESTIONS_PER_QUERY = 100
+
+# Durée de conservation des résultats en cache : une nouvelle version les remplace avant
+RESULTS_CACHE_TIMEOUT = 60 * 60
+
+
+def results_cache_key(survey, version, params=''):
+    """Clé de cache des résultats d'un sondage pour une version et des filtres donnés.
+
+    La date de création distingue un sondage recréé avec le même identifiant
+    (base restaurée ou réinitialisée).
+    """
+    digest = md5(f'{survey.created_at.isoformat()}:{params}'.encode()).hexdigest()
+    return f'survey-results:{survey.pk}:{version}:{digest}'
+
+
+def aggregate_counts(survey, responses=None):
+    """Compte les réponses brutes d'un sondage en trois requêtes groupées.
+
+    `responses` restreint éventuellement le calcul à un queryset de `Response`.
+    Retourne (nombre de participants, réponses par question, sélections par choix),
+    au même format que `read_tallies`.
+    """
+    if responses is None:
+        responses = Response.objects.filter(survey=survey)
+        answers = Answer.objects.filter(response__survey=survey)
+    else:
+        answers = Answer.objects.filter(response__in=responses.values('pk'))
+
+    participants = responses.count()
+    question_counts = dict(
+        answers.values('question_id')
+        .annotate(total=Count('id'))
+        .values_list('question_id', 'total')
+    )
+    choice_counts = dict(
+        Answer.selected_choices.through.objects.filter(answer__in=answers.values('pk'))
+        .values('choice_id')
+        .annotate(total=Count('id'))
+        .values_list('choice_id', 'total')
+    )
+    return participants, question_counts, choice_counts
+
+
+def text_answers_queryset(responses=None):
+    """Réponses texte non vides, éventuellement restreintes à un queryset de `Response`."""
+    answers = Answer.objects.exclude(text_answer__isnull=True).exclude(text_answer='')
+    if responses is not None:
+        answers = answers.filter(response__in=responses.values('pk'))
+    return answers
+
+
+def first_text_pages_sql(question_ids, responses=None, limit=TEXT_ANSWERS_PAGE_SIZE):
+    """Requête (SQL, paramètres) des `limit` + 1 premières réponses texte de chaque question.
+
+    Une sous-requête `ORDER BY id LIMIT` par question, réunies par UNION ALL :
+    chacune parcourt l'index de `question_id` et s'arrête après `limit` + 1
+    lignes, quel que soit le nombre total de réponses. SQLite n'accepte pas
+    de LIMIT dans les membres d'une union construite par l'ORM, d'où
+    l'enveloppe `SELECT * FROM (...)`.
+    """
+    parts = []
+    params = []
+    for question_id in question_ids:
+        page = (
+            text_answers_queryset(responses)
+            .filter(question_id=question_id)
+            .order_by('id')
+            .values_list('question_id', 'id', 'text_answer')[:limit + 1]
+        )
+        sql, page_params = page.query.sql_with_params()
+        parts.append(f'SELECT * FROM ({sql})')
+        params.extend(page_params)
+    return ' UNION ALL '.join(parts), params
+
+
+def collect_text_answers(survey, responses=None, limit=TEXT_ANSWERS_PAGE_SIZE, question_ids=None):
+    """Récupère la première page de réponses texte de chaque question texte du sondage.
+
+    Retourne, par question, (textes, curseur de la page suivante ou None). Les
+    ids des questions texte sont lus en base si `question_ids` n'est pas fourni.
+    """
+    if question_ids is None:
+        question_ids = list(survey.questions.filter(question_type='text').values_list('id', flat=True))
+    rows = defaultdict(list)
+    # SQLite limite le nombre de membres d'une union
+    for start in range(0, len(question_ids), TEXT_QUESTIONS_PER_QUERY):
+        sql, params = first_text_pages_sql(question_ids[start:start + TEXT_QUESTIONS_PER_QUERY], responses, limit)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            for question_id, answer_id, text in cursor.fetchall():
+                rows[question_id].append((answer_id, text))
+    return {
+        question_id: ([text for _, text in page[:limit]], page[limit - 1][0] if len(page) > limit else None)
+        for question_id, page in rows.items()
+    }
+
+
+def text_answers_page(question, after=None, responses=None, limit=TEXT_ANSWERS_PAGE_SIZE):
+    """Page de réponses texte d'une question, paginée par clé sur `Answer.id`.
+
+    Retourne ([(id, texte), ...], curseur de la page suivante ou None) ; le coût
+    d'une page ne dépend pas de sa position.
+    """
+    answers = text_answers_queryset(responses).filter(question=question)
+    if after is not None:
+        answers = answers.filter(id__gt=after)
+    page = list(answers.order_by('id').values_list('id', 'text_answer')[:limit + 1])
+    return page[:limit], page[limit - 1][0] if len(page) > limit else None
+
+
+def build_questions_stats(questions, question_counts, choice_counts, text_answers, top_terms=None):
+    """Construit la structure `questions_stats` à partir de décomptes déjà calculés.
+
+    Les choix des questions doivent avoir été préchargés (`prefetch_related('choices')`)
+    et `text_answers` est au format retourné par `collect_text_answers`. Les
+    résumés de termes `top_terms` ne sont ajoutés que s'ils sont fournis.
+    """
+    questions_stats = []
+    for question in questions:
+        total = question_counts.get(question.id, 0)
+        stats = {
+            'question': question,
+            'total_responses': total,
+        }
+
+        if question.question_type == 'text':
+            stats['text_answers'], stats['text_answers_next'] = text_answers.get(question.id, ([], None))
+            if top_terms is not None:
+                stats['top_terms'] = top_terms.get(question.id, [])
+        else:
+            choices_stats = []
+            for choice in question.choices.all():
+                choice_count = choice_counts.get(choice.id, 0)
+                percentage = (choice_count / total * 100) if total > 0 else 0
+                choices_stats.append({
+                    'choice': choice,
+                    'count': choice_count,
+                    'percentage': round(percentage, 1)
+                })
+            stats['choices_stats'] = choices_stats
+
+        questions_stats.append(stats)
+    return questions_stats
+
+
+def survey_results(survey, responses=None, window=None):
+    """Retourne (nombre de participants, questions_stats) pour un sondage.
+
+    Sans restriction, les décomptes et les résumés de termes proviennent des
+    compteurs maintenus à chaque participation. Restreints à une fenêtre de
+    dates `window` = (début, fin), ils sont lus dans les compteurs horaires.
+    Avec un queryset `responses`, ils sont agrégés à la demande. Les résumés
+    de termes ne sont fournis que pour le sondage entier.
+    """
+    top_terms = None
+    if responses is not None:
+        responses = restrict_to_window(responses, window)
+        counts = aggregate_counts(survey, responses)
+    elif window is not None:
+        counts = read_window_tallies(survey, *window)
+        responses = restrict_to_window(Response.objects.filter(survey=survey), window)
+    else:
+        counts = read_tallies(survey)
+        top_terms = read_top_terms(survey)
+    participants, question_counts, choice_counts = counts
+
+    questions = list(survey.questions.prefetch_related('choices'))
+    text_answers = collect_text_answers(
+        survey, responses, question_ids=[question.id for question in questions if question.question_type == 'text']
+    )
+    return participants, build_questions_stats(questions, question_counts, choice_counts, text_answers, top_terms)
+
+
+def restrict_to_window(responses, window):
+    """Restreint un queryset de `Response` aux participations soumises dans [début, fin)."""
+    if window is None:
+        return responses
+    start, end = window
+    return responses.filter(submitted_at__gte=start, submitted_at__lt=end)
+
+
+def segment_responses(survey, choice_ids):
+    """Restreint les participations à celles ayant sélectionné tous les choix donnés.
+
+    Chaque choix ajoute une sous-requête sur la table de liaison `selected_choices`,
+    indexée par choix : le segment est entièrement calculé en base.
+    """
+    responses = Response.objects.filter(survey=survey)
+    through = Answer.selected_choices.through
+    for choice_id in choice_ids:
+        responses = responses.filter(
+            pk__in=through.objects.filter(choice_id=choice_id).values('answer__response_id')
+        )
+    return responses
+
+
+def crosstab(row_question, column_question, responses=None):
+    """Croise les choix de deux questions en une seule requête groupée.
+
+    Pour chaque choix de `row_question`, compte les participants ayant aussi
+    sélectionné chacun des choix de `column_question`.
+    """
+    through = Answer.selected_choices.through
+    pairs = through.objects.filter(
+        answer__question=row_question,
+        answer__response__answers__question=column_question,
+    )
+    if responses is not None:
+        pairs = pairs.filter(answer__response__in=responses.values('pk'))
+    counts = {
+        (row_choice_id, column_choice_id): total
+        for row_choice_id, column_choice_id, total in pairs
+        .values('choice_id', 'answer__response__answers__selected_choices')
+        .annotate(total=Count('id'))
+        .values_list('choice_id', 'answer__response__answers__selected_choices', 'total')
+    }
+
+    columns = list(Choice.objects.filter(question=column_question))
+    rows = []
+    column_totals = [0] * len(columns)
+    for choice in Choice.objects.filter(question=row_question):
+        row_counts = [counts.get((choice.id, column.id), 0) for column in columns]
+        for i, count in enumerate(row_counts):
+            column_totals[i] += count
+        rows.append({'choice': choice, 'counts': row_counts, 'total': sum(row_counts)})
+
+    return {
+        'row_question': row_question,
+        'column_question': column_question,
+        'columns': columns,
+        'rows': rows,
+        'column_totals': column_totals,
+        'total': sum(column_totals),
+    }
@@ -0,0 +1,210 @@
+"""Schéma compilé des questions d'un sondage, pour construire les formulaires de participation.
+
+Le schéma est une copie figée des questions et de leurs choix ordonnés,
+chargée en une requête avec préchargement. Pour les sondages publiés, il est
+conservé en mémoire dans le processus et réutilisé tant que la date de
+modification du sondage (`Survey.updated_at`) n'a pas changé ; toute
+modification d'une question ou d'un choix met cette date à jour. Au plus
+`SCHEMA_CACHE_SIZE` schémas sont conservés, les moins récemment utilisés
+étant écartés.
+
+Les conditions d'affichage (`Question.condition_choices`) y sont compilées
+une fois pour toutes en tables de correspondance : pour chaque choix, les
+questions qu'il fait apparaître. Une question conditionnelle n'est visible
+que si l'un de ses choix déclencheurs est sélectionné dans une question
+précédente elle-même visible. L'évaluation parcourt uniquement les questions
+répondues, sans requête ni relecture des règles.
+"""
+import threading
+from collections import OrderedDict
+
+from django.db.models import Prefetch
+
+from .models import Choice, Question
+
+# Nombre maximal de schémas conservés en mémoire par processus
+SCHEMA_CACHE_SIZE = 256
+
+_schemas = OrderedDict()
+_schemas_lock = threading.Lock()
+
+
+class _Frozen:
+    """Objet à attributs fixés à la construction."""
+    __slots__ = ()
+
+    def __init__(self, **values):
+        for name, value in values.items():
+            object.__setattr__(self, name, value)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} est immuable")
+
+    def __delattr__(self, name):
+        raise AttributeError(f"{type(self).__name__} est immuable")
+
+
+class ChoiceSchema(_Frozen):
+    __slots__ = ('id', 'text')
+
+    def __str__(self):
+        return self.text
+
+
+class QuestionSchema(_Frozen):
+    __slots__ = ('id', 'text', 'question_type', 'required', 'order', 'choices', 'conditions')
+
+    def __str__(self):
+        return self.text
+
+    def get_choice(self, choice_id):
+        """Choix de la question d'identifiant `choice_id`, ou None."""
+        for choice in self.choices:
+            if choice.id == choice_id:
+                return choice
+        return None
+
+
+class SurveySchema(_Frozen):
+    # positions : rang de chaque question ; unconditional : questions toujours visibles ;
+    # triggers : id de choix -> (id de sa question, questions qu'il fait apparaître)
+    __slots__ = ('id', 'updated_at', 'questions', 'positions', 'unconditional', 'triggers')
+
+    def branching(self):
+        """Tables des conditions d'affichage pour le formulaire (JSON), ou None sans condition."""
+        if not self.triggers:
+            return None
+        return {
+            'positions': {str(question_id): position for question_id, position in self.positions.items()},
+            'unconditional': sorted(self.unconditional),
+            'triggers': {
+                str(choice_id): [source, sorted(question_ids)]
+                for choice_id, (source, question_ids) in self.triggers.items()
+            },
+        }
+
+    def visible_question_ids(self, answers):
+        """Ids des questions visibles selon `answers`, au format JSON {id de question (texte): valeur}.
+
+        Les questions répondues sont parcourues dans l'ordre du sondage : un
+        choix ne fait apparaître des questions que si sa propre question est
+        visible. Les valeurs qui ne sont pas des ids de choix sont ignorées.
+        """
+        if not self.triggers:
+            return self.unconditional
+        visible = set(self.unconditional)
+        answered = sorted(
+            (self.positions[int(key)], int(key), value)
+            for key, value in answers.items()
+            if str(key).isdigit() and int(key) in self.positions and value is not None
+        )
+        for _, question_id, value in answered:
+            if question_id not in visible:
+                continue
+            for choice_id in value if isinstance(value, list) else [value]:
+                try:
+                    trigger = self.triggers.get(int(choice_id))
+                except (TypeError, ValueError):
+                    continue
+                if trigger and trigger[0] == question_id:
+                    visible.update(trigger[1])
+        return visible
+
+
+def compile_conditions(questions, conditions):
+    """Tables de correspondance des conditions d'affichage.
+
+    `conditions` associe l'id d'une question aux ids de ses choix déclencheurs.
+    Seuls les choix d'une question précédente sont retenus (voir `condition_errors`).
+    """
+    positions = {question.id: position for position, question in enumerate(questions)}
+    choice_questions = {
+        choice.id: question.id
+        for question in questions
+        for choice in question.choices.all()
+    }
+    triggers = {}
+    for question in questions:
+        for choice_id in conditions.get(question.id, ()):
+            source = choice_questions.get(choice_id)
+            if source is not None and positions[source] < positions[question.id]:
+                triggers.setdefault(choice_id, (source, set()))[1].add(question.id)
+    dependent = {question_id for _, question_ids in triggers.values() for question_id in question_ids}
+    return (
+        positions,
+        frozenset(positions) - dependent,
+        {choice_id: (source, frozenset(question_ids)) for choice_id, (source, question_ids) in triggers.items()},
+    )
+
+
+def load_conditions(survey):
+    conditions = {}
+    rows = Question.condition_choices.through.objects.filter(question__survey=survey)
+    for question_id, choice_id in rows.values_list('question_id', 'choice_id'):
+        conditions.setdefault(question_id, []).append(choice_id)
+    return conditions
+
+
+def condition_errors(survey):
+    """Conditions d'affichage invalides : choix d'une question qui n'est pas placée avant."""
+    questions = Question.objects.filter(survey=survey).order_by('order', 'id').prefetch_related('condition_choices')
+    positions = {}
+    errors = []
+    for position, question in enumerate(questions):
+        positions[question.id] = position
+        for choice in question.condition_choices.all():
+            # Les questions suivantes ou d'un autre sondage ne sont pas encore dans `positions`
+            if choice.question_id not in positions or choice.question_id == question.id:
+                errors.append(
+                    f"La question '{question.text}' dépend du choix '{choice.text}', "
+                    f"qui doit appartenir à une question précédente du sondage."
+                )
+    return errors
+
+
+def compile_schema(survey):
+    """Construit le schéma d'un sondage : une requête sur les questions, une sur les choix, une sur les conditions."""
+    questions = list(Question.objects.filter(survey=survey).order_by('order', 'id').prefetch_related(
+        Prefetch('choices', queryset=Choice.objects.order_by('order', 'id').only('id', 'text', 'question_id'))
+    ))
+    conditions = load_conditions(survey) if questions else {}
+    positions, unconditional, triggers = compile_conditions(questions, conditions)
+    return SurveySchema(
+        id=survey.pk,
+        updated_at=survey.updated_at,
+        questions=tuple(
+            QuestionSchema(
+                id=question.id,
+                text=question.text,
+                question_type=question.question_type,
+                required=question.required,
+                order=question.order,
+                choices=tuple(ChoiceSchema(id=choice.id, text=choice.text) for choice in question.choices.all()),
+                conditions=tuple(sorted(
+                    choice_id for choice_id, (_, question_ids) in triggers.items() if question.id in question_ids
+                )),
+            )
+            for question in questions
+        ),
+        positions=positions,
+        unconditional=unconditional,
+        triggers=triggers,
+    )
+
+
+def get_schema(survey):
+    """Schéma d'un sondage, mis en cache dans le processus pour les sondages publiés."""
+    if not survey.is_published():
+        return compile_schema(survey)
+    with _schemas_lock:
+        schema = _schemas.get(survey.pk)
+        if schema is not None and schema.updated_at == survey.updated_at:
+            _schemas.move_to_end(survey.pk)
+            return schema
+    schema = compile_schema(survey)
+    with _schemas_lock:
+        _schemas[survey.pk] = schema
+        _schemas.move_to_end(survey.pk)
+        while len(_schemas) > SCHEMA_CACHE_SIZE:
+            _schemas.popitem(last=False)
+    return schema
@@ -0,0 +1,109 @@
+"""Recherche plein texte dans les réponses ouvertes et dans les sondages.
+
+Sur SQLite, les réponses texte sont indexées dans une table virtuelle FTS5
+(`survey_answer_fts`) tenue à jour par des déclencheurs : chaque réponse
+enregistrée, modifiée ou supprimée est répercutée dans l'index dans la même
+transaction. Les titres et descriptions des sondages le sont de la même façon
+dans `survey_survey_fts`. Sur les autres bases, ou si FTS5 n'est pas
+disponible, la recherche se rabat sur `icontains`.
+"""
+import re
+
+from django.db import connection
+from django.db.models import FloatField, Q
+from django.db.models.expressions import RawSQL
+
+from .models import Answer, Question, Survey
+
+ANSWER_FTS_TABLE = 'survey_answer_fts'
+SURVEY_FTS_TABLE = 'survey_survey_fts'
+
+# Poids du titre et de la description dans le classement bm25 des sondages
+SURVEY_RANK_WEIGHTS = (10.0, 1.0)
+
+_fts_tables = {}
+
+
+def fts_available(table):
+    """Indique si la table FTS5 `table` existe sur la base courante (résultat mémorisé)."""
+    if connection.vendor != 'sqlite':
+        return False
+    key = (connection.settings_dict['NAME'], table)
+    if key not in _fts_tables:
+        _fts_tables[key] = table in connection.introspection.table_names()
+    return _fts_tables[key]
+
+
+def search_terms(text):
+    """Découpe une saisie utilisateur en mots recherchables."""
+    return re.findall(r'\w+', text or '')
+
+
+def build_match_query(text, prefix=False):
+    """Construit une expression MATCH FTS5 sûre : chaque mot est cité, tous sont requis."""
+    suffix = '*' if prefix else ''
+    return ' '.join(f'"{term}"{suffix}' for term in search_terms(text))
+
+
+def search_text_answers(survey, text, question=None, limit=20, offset=0):
+    """Cherche `text` dans les réponses ouvertes d'un sondage.
+
+    Les réponses sont classées par pertinence (bm25) avec FTS5, par ordre
+    antichronologique sinon. Retourne (réponses, existence d'une page suivante).
+    """
+    terms = search_terms(text)
+    if not terms:
+        return [], False
+
+    if fts_available(ANSWER_FTS_TABLE):
+        sql = (
+            f'SELECT a.* FROM {ANSWER_FTS_TABLE} f'
+            f' JOIN {Answer._meta.db_table} a ON a.id = f.rowid'
+            f' JOIN {Question._meta.db_table} q ON q.id = a.question_id'
+            f' WHERE {ANSWER_FTS_TABLE} MATCH %s AND q.survey_id = %s'
+        )
+        params = [build_match_query(text), survey.pk]
+        if question is not None:
+            sql += ' AND a.question_id = %s'
+            params.append(question.pk)
+        sql += ' ORDER BY f.rank LIMIT %s OFFSET %s'
+        answers = list(Answer.objects.raw(sql, params + [limit + 1, offset]))
+    else:
+        queryset = Answer.objects.filter(question__survey=survey)
+        if question is not None:
+            queryset = queryset.filter(question=question)
+        for term in terms:
+            queryset = queryset.filter(text_answer__icontains=term)
+        answers = list(queryset.order_by('-id')[offset:offset + limit + 1])
+
+    return answers[:limit], len(answers) > limit
+
+
+def search_surveys(queryset, text):
+    """Restreint `queryset` aux sondages dont le titre ou la description contient tous les mots de `text`.
+
+    Avec FTS5, chaque mot est cherché comme préfixe et les sondages sont
+    annotés de leur pertinence `search_rank` (bm25, plus petit = plus
+    pertinent). Retourne (sondages, classement disponible).
+    """
+    terms = search_terms(text)
+    if not terms:
+        return queryset, False
+
+    if fts_available(SURVEY_FTS_TABLE):
+        weights = ', '.join(str(weight) for weight in SURVEY_RANK_WEIGHTS)
+        match = build_match_query(text, prefix=True)
+        survey_table = Survey._meta.db_table
+        queryset = queryset.filter(
+            pk__in=RawSQL(f'SELECT rowid FROM {SURVEY_FTS_TABLE} WHERE {SURVEY_FTS_TABLE} MATCH %s', [match])
+        ).annotate(search_rank=RawSQL(
+            f'SELECT bm25({SURVEY_FTS_TABLE}, {weights}) FROM {SURVEY_FTS_TABLE}'
+            f' WHERE {SURVEY_FTS_TABLE} MATCH %s AND {SURVEY_FTS_TABLE}.rowid = "{survey_table}"."id"',
+            [match],
+            output_field=FloatField(),
+        ))
+        return queryset, True
+
+    for term in terms:
+        queryset = queryset.filter(Q(title__icontains=term) | Q(description__icontains=term))
+    return queryset, False
@@ -0,0 +1,183 @@
+"""Enregistrement des participations.
+
+Toutes les réponses d'une participation sont validées avant d'ouvrir la
+transaction ; l'écriture se fait ensuite avec un nombre constant de requêtes,
+quel que soit le nombre de questions : la réponse, toutes les lignes `Answer`
+en un `bulk_create`, toutes les sélections de choix en un second, puis les
+compteurs. Le verrou d'écriture de SQLite est ainsi tenu le moins longtemps
+possible. Un lot de participations (API JSON) s'écrit de la même façon, avec
+un nombre de requêtes qui ne dépend pas de la taille du lot.
+
+Les lignes créées par `bulk_create` ne reçoivent leur clé primaire que si la
+base sait la renvoyer (SQLite 3.35 ou plus récent) ; sinon, les clés sont
+relues en une requête d'après une combinaison de champs unique.
+"""
+import secrets
+import time
+
+from django.db import connection, transaction
+from django.utils.datastructures import MultiValueDict
+
+from .availability import remember_participations
+from .forms import AnswerForm
+from .models import Answer, Response, bump_results_version
+from .tallies import record_submission, record_submissions
+
+# Champ de `AnswerForm` portant la réponse, selon le type de question
+ANSWER_FIELDS = {
+    'single': 'single_choice',
+    'multiple': 'selected_choices',
+    'text': 'text_answer',
+}
+
+
+def build_answer_forms(questions, data=None):
+    """Un `AnswerForm` par question du schéma, liés aux données POST `data` si fournies."""
+    return [
+        (question, AnswerForm(question=question, data=data, prefix=f'question_{question.id}'))
+        for question in questions
+    ]
+
+
+def clean_answers(question_forms, visible=None):
+    """Valide les formulaires d'une participation.
+
+    Retourne la liste des réponses sous forme de triplets (question, choix
+    sélectionnés, texte) issus du schéma, ou None si une question obligatoire
+    est invalide. Les questions facultatives invalides sont ignorées, ainsi
+    que les questions masquées par les conditions d'affichage quand les ids
+    des questions visibles `visible` sont fournis.
+    """
+    answers = []
+    has_errors = False
+    for question, form in question_forms:
+        if visible is not None and question.id not in visible:
+            continue
+        if not form.is_valid():
+            has_errors = has_errors or question.required
+            continue
+        choices = form.get_selected_choices() if question.question_type in ['single', 'multiple'] else []
+        text = form.cleaned_data.get('text_answer') if question.question_type == 'text' else None
+        answers.append((question, choices, text))
+    return None if has_errors else answers
+
+
+def answers_data(questions, answers):
+    """Convertit des réponses au format JSON (voir `clean_json_answers`) en données de formulaire."""
+    data = MultiValueDict()
+    for question in questions:
+        value = answers.get(str(question.id))
+        if value is None:
+            continue
+        values = value if isinstance(value, list) else [value]
+        data.setlist(f'question_{question.id}-{ANSWER_FIELDS[question.question_type]}', [str(v) for v in values])
+    return data
+
+
+def clean_json_answers(schema, answers):
+    """Valide les réponses d'une participation reçue en JSON.
+
+    `answers` associe l'id d'une question (en texte) à un id de choix, une
+    liste d'ids de choix ou un texte. Les questions masquées par les
+    conditions d'affichage sont ignorées. Retourne (réponses au format de
+    `clean_answers` ou None, erreurs par id de question).
+    """
+    question_forms = build_answer_forms(schema.questions, data=answers_data(schema.questions, answers))
+    visible = schema.visible_question_ids(answers)
+    errors = {
+        str(question.id): [error for field_errors in form.errors.values() for error in field_errors]
+        for question, form in question_forms
+        if question.id in visible and question.required and not form.is_valid()
+    }
+    return clean_answers(question_forms, visible), errors
+
+
+def new_respondent_token():
+    """Jeton de participant anonyme.
+
+    Il commence par l'heure en millisecondes : les nouveaux jetons s'insèrent
+    en fin d'index plutôt qu'à une position aléatoire.
+    """
+    return f'{time.time_ns() // 1_000_000:012x}{secrets.token_hex(10)}'
+
+
+def bulk_create_with_ids(model, objs, key_fields, **lookup):
+    """`bulk_create` qui garantit les clés primaires des objets créés.
+
+    Sans `RETURNING`, elles sont relues parmi les lignes correspondant à
+    `lookup`, identifiées par les champs `key_fields` (combinaison unique).
+    """
+    objs = model.objects.bulk_create(objs)
+    if objs and not connection.features.can_return_rows_from_bulk_insert:
+        ids = {
+            tuple(values[:-1]): values[-1]
+            for values in model.objects.filter(**lookup).values_list(*key_fields, 'pk')
+        }
+        for obj in objs:
+            obj.pk = ids[tuple(getattr(obj, field) for field in key_fields)]
+    return objs
+
+
+@transaction.atomic
+def save_submission(survey, respondent, answers, respondent_token=None):
+    """Enregistre une participation validée par `clean_answers` et met à jour les compteurs.
+
+    Pour un sondage anonyme, `respondent` est None et `respondent_token`
+    identifie le participant.
+    """
+    response = Response.objects.create(survey=survey, respondent=respondent, respondent_token=respondent_token)
+
+    rows = bulk_create_with_ids(Answer, [
+        Answer(response=response, question_id=question.id, text_answer=text)
+        for question, _, text in answers
+    ], ['question_id'], response=response)
+    Through = Answer.selected_choices.through
+    Through.objects.bulk_create([
+        Through(answer_id=row.pk, choice_id=choice.id)
+        for row, (_, choices, _) in zip(rows, answers)
+        for choice in choices
+    ])
+
+    record_submission(
+        survey,
+        [(question.id, [choice.id for choice in choices], text) for question, choices, text in answers],
+        response.submitted_at
+    )
+    return response
+
+
+@transaction.atomic
+def save_submissions(survey, submissions):
+    """Enregistre un lot de participations en quelques requêtes.
+
+    `submissions` contient des triplets (participant, jeton anonyme, réponses
+    validées). Les participants doivent être distincts et ne pas avoir déjà
+    participé : un doublon fait échouer tout le lot (IntegrityError).
+    """
+    responses = bulk_create_with_ids(Response, [
+        Response(survey=survey, respondent=respondent, respondent_token=respondent_token)
+        for respondent, respondent_token, _ in submissions
+    ], ['respondent_id', 'respondent_token'], survey=survey)
+    rows = bulk_create_with_ids(Answer, [
+        Answer(response=response, question_id=question.id, text_answer=text)
+        for response, (_, _, answers) in zip(responses, submissions)
+        for question, _, text in answers
+    ], ['response_id', 'question_id'], response__in=responses)
+    Through = Answer.selected_choices.through
+    all_answers = [answer for _, _, answers in submissions for answer in answers]
+    Through.objects.bulk_create([
+        Through(answer_id=row.pk, choice_id=choice.id)
+        for row, (_, choices, _) in zip(rows, all_answers)
+        for choice in choices
+    ])
+
+    record_submissions(survey, [
+        ([(question.id, [choice.id for choice in choices], text) for question, choices, text in answers], response.submitted_at)
+        for response, (_, _, answers) in zip(responses, submissions)
+    ])
+    # bulk_create n'envoie pas les signaux qui changent la version des résultats
+    # ni ceux qui complètent les participations en cache
+    bump_results_version(survey=survey)
+    pairs = [(response.respondent_id, survey.pk) for response in responses]
+    transaction.on_commit(lambda: remember_participations(pairs))
+    return responses
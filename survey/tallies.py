@@ -0,0 +1,420 @@
+"""Compteurs de résultats maintenus à chaque participation.
+
+Les compteurs évitent de recompter les lignes `Answer` à chaque affichage des
+résultats : ils sont incrémentés dans la transaction qui enregistre une
+participation et peuvent être reconstruits à partir des réponses brutes
+(commande `rebuild_tallies`).
+"""
+from collections import Counter, defaultdict
+from datetime import timezone as dt_timezone
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum, Window
+from django.db.models.functions import RowNumber, TruncDate, TruncHour
+from django.utils import timezone
+
+from .models import (
+    Answer, Choice, ChoiceBucket, ChoiceTally, ParticipationBucket, Question, QuestionBucket,
+    QuestionTally, Response, SurveyTally, TermCount,
+)
+from .textstats import extract_terms
+
+# Nombre de termes affichés dans le résumé d'une question texte
+TOP_TERMS = 10
+
+
+def _increment(model, field, rows, key='pk', **lookup):
+    """Crée les compteurs manquants puis les incrémente d'une unité par ligne de `rows`.
+
+    Les compteurs à incrémenter sont ceux dont le champ `key` prend une des
+    valeurs de `rows`, parmi ceux correspondant à `lookup`. Une même valeur
+    peut apparaître plusieurs fois : une requête de mise à jour est faite par
+    nombre d'occurrences distinct (une seule pour une participation).
+    """
+    if not rows:
+        return
+    occurrences = Counter(getattr(row, key) for row in rows)
+    model.objects.bulk_create(
+        list({getattr(row, key): row for row in rows}.values()),
+        ignore_conflicts=True
+    )
+    values_by_amount = defaultdict(list)
+    for value, amount in occurrences.items():
+        values_by_amount[amount].append(value)
+    for amount, values in values_by_amount.items():
+        model.objects.filter(**lookup, **{f'{key}__in': values}).update(**{field: F(field) + amount})
+
+
+def _decrement(model, field, values, key='pk', **lookup):
+    """Décrémente d'une unité par occurrence de `values` les compteurs dont le champ `key` prend ces valeurs."""
+    values_by_amount = defaultdict(list)
+    for value, amount in Counter(values).items():
+        values_by_amount[amount].append(value)
+    for amount, grouped in values_by_amount.items():
+        model.objects.filter(**lookup, **{f'{key}__in': grouped}).update(**{field: F(field) - amount})
+
+
+def bucket_hour(moment):
+    """Début (UTC) de l'heure contenant `moment` : clé des compteurs horaires."""
+    return moment.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+
+
+def record_submission(survey, answers, submitted_at):
+    """Répercute une participation sur les compteurs du sondage.
+
+    `answers` est une liste de triplets (id de la question, ids des choix
+    sélectionnés, texte de la réponse). Les compteurs globaux et ceux de
+    l'heure de `submitted_at` sont incrémentés. Doit être appelée dans la
+    transaction qui crée la réponse.
+    """
+    record_submissions(survey, [(answers, submitted_at)])
+
+
+def record_submissions(survey, submissions):
+    """Répercute un lot de participations, couples (réponses, date de soumission), sur les compteurs.
+
+    Le nombre de requêtes ne dépend pas de la taille du lot, seulement du
+    nombre d'heures distinctes couvertes.
+    """
+    if not submissions:
+        return
+    question_ids = [question_id for answers, _ in submissions for question_id, _, _ in answers]
+    choice_ids = [choice_id for answers, _ in submissions for _, ids, _ in answers for choice_id in ids]
+
+    _increment(SurveyTally, 'participants', [SurveyTally(survey=survey)] * len(submissions))
+    _increment(QuestionTally, 'answers', [
+        QuestionTally(question_id=question_id, survey=survey)
+        for question_id in question_ids
+    ])
+    _increment(ChoiceTally, 'count', [
+        ChoiceTally(choice_id=choice_id, survey=survey)
+        for choice_id in choice_ids
+    ])
+
+    by_hour = defaultdict(list)
+    for answers, submitted_at in submissions:
+        by_hour[bucket_hour(submitted_at)].append(answers)
+    for hour, hour_answers in by_hour.items():
+        _increment(ParticipationBucket, 'count', [
+            ParticipationBucket(survey=survey, hour=hour)
+        ] * len(hour_answers), key='survey_id', hour=hour)
+        _increment(QuestionBucket, 'count', [
+            QuestionBucket(question_id=question_id, survey=survey, hour=hour)
+            for answers in hour_answers
+            for question_id, _, _ in answers
+        ], key='question_id', hour=hour)
+        _increment(ChoiceBucket, 'count', [
+            ChoiceBucket(choice_id=choice_id, survey=survey, hour=hour)
+            for answers in hour_answers
+            for _, ids, _ in answers
+            for choice_id in ids
+        ], key='choice_id', hour=hour)
+
+    record_terms([
+        (question_id, text)
+        for answers, _ in submissions
+        for question_id, _, text in answers
+        if text
+    ])
+
+
+def record_terms(texts):
+    """Incrémente les fréquences de termes pour des couples (id de la question, texte).
+
+    Chaque terme compte une fois par réponse. Pour une participation, deux
+    requêtes suffisent quel que soit le nombre de questions texte ; un lot
+    ajoute une mise à jour par nombre d'occurrences distinct.
+    """
+    counts = Counter(
+        (question_id, term)
+        for question_id, text in texts
+        for term in extract_terms(text)
+    )
+    if not counts:
+        return
+
+    TermCount.objects.bulk_create([
+        TermCount(question_id=question_id, term=term)
+        for question_id, term in counts
+    ], ignore_conflicts=True)
+    terms_by_amount = defaultdict(lambda: defaultdict(list))
+    for (question_id, term), amount in counts.items():
+        terms_by_amount[amount][question_id].append(term)
+    for amount, terms_by_question in terms_by_amount.items():
+        condition = Q()
+        for question_id, terms in terms_by_question.items():
+            condition |= Q(question_id=question_id, term__in=terms)
+        TermCount.objects.filter(condition).update(count=F('count') + amount)
+
+
+def retract_submission(response):
+    """Retire des compteurs une participation sur le point d'être supprimée.
+
+    Inverse de `record_submission` : doit être appelée dans la transaction qui
+    supprime la réponse, avant la suppression de ses `Answer`.
+    """
+    answers = list(Answer.objects.filter(response=response).values_list('id', 'question_id', 'text_answer'))
+    choice_ids = list(
+        Answer.selected_choices.through.objects.filter(answer__response=response).values_list('choice_id', flat=True)
+    )
+    question_ids = [question_id for _, question_id, _ in answers]
+    hour = bucket_hour(response.submitted_at)
+
+    SurveyTally.objects.filter(survey_id=response.survey_id).update(participants=F('participants') - 1)
+    _decrement(QuestionTally, 'answers', question_ids)
+    _decrement(ChoiceTally, 'count', choice_ids)
+    _decrement(ParticipationBucket, 'count', [response.survey_id], key='survey_id', hour=hour)
+    _decrement(QuestionBucket, 'count', question_ids, key='question_id', hour=hour)
+    _decrement(ChoiceBucket, 'count', choice_ids, key='choice_id', hour=hour)
+
+    counts = Counter(
+        (question_id, term)
+        for _, question_id, text in answers if text
+        for term in extract_terms(text)
+    )
+    terms_by_amount = defaultdict(lambda: defaultdict(list))
+    for (question_id, term), amount in counts.items():
+        terms_by_amount[amount][question_id].append(term)
+    for amount, terms_by_question in terms_by_amount.items():
+        condition = Q()
+        for question_id, terms in terms_by_question.items():
+            condition |= Q(question_id=question_id, term__in=terms)
+        TermCount.objects.filter(condition).update(count=F('count') - amount)
+
+
+def read_top_terms(survey, limit=TOP_TERMS):
+    """Retourne, par question texte, les `limit` termes les plus fréquents (une requête)."""
+    rows = (
+        TermCount.objects.filter(question__survey=survey, count__gt=0)
+        .annotate(position=Window(RowNumber(), partition_by=F('question_id'), order_by=[F('count').desc(), F('term').asc()]))
+        .filter(position__lte=limit)
+        .order_by('question_id', 'position')
+        .values_list('question_id', 'term', 'count')
+    )
+    top_terms = defaultdict(list)
+    for question_id, term, count in rows:
+        top_terms[question_id].append((term, count))
+    return top_terms
+
+
+def read_results_version(survey):
+    """Version des résultats d'un sondage et date de leur dernière modification."""
+    version = SurveyTally.objects.filter(survey=survey).values_list('version', 'updated_at').first()
+    return version or (0, survey.updated_at)
+
+
+def read_tallies(survey):
+    """Lit les compteurs d'un sondage sans parcourir la table des réponses.
+
+    Retourne (nombre de participants, réponses par question, sélections par choix).
+    """
+    participants = SurveyTally.objects.filter(survey=survey).values_list('participants', flat=True).first() or 0
+    question_counts = dict(QuestionTally.objects.filter(survey=survey).values_list('question_id', 'answers'))
+    choice_counts = dict(ChoiceTally.objects.filter(survey=survey).values_list('choice_id', 'count'))
+    return participants, question_counts, choice_counts
+
+
+def read_window_tallies(survey, start, end):
+    """Lit les décomptes des participations soumises dans [start, end) à partir des compteurs horaires.
+
+    Même format que `read_tallies` ; les bornes sont arrondies à l'heure.
+    """
+    window = {'survey': survey, 'hour__gte': bucket_hour(start), 'hour__lt': bucket_hour(end)}
+    participants = ParticipationBucket.objects.filter(**window).aggregate(total=Sum('count'))['total'] or 0
+    question_counts = dict(
+        QuestionBucket.objects.filter(**window)
+        .values('question_id')
+        .annotate(total=Sum('count'))
+        .values_list('question_id', 'total')
+    )
+    choice_counts = dict(
+        ChoiceBucket.objects.filter(**window)
+        .values('choice_id')
+        .annotate(total=Sum('count'))
+        .values_list('choice_id', 'total')
+    )
+    return participants, question_counts, choice_counts
+
+
+def participation_series(survey, granularity='day', start=None, end=None):
+    """Participations par heure ou par jour (fuseau courant), lues dans les compteurs horaires.
+
+    Retourne une liste de couples (début de la période, nombre de participations).
+    """
+    buckets = ParticipationBucket.objects.filter(survey=survey)
+    if start is not None:
+        buckets = buckets.filter(hour__gte=bucket_hour(start))
+    if end is not None:
+        buckets = buckets.filter(hour__lt=bucket_hour(end))
+    if granularity == 'hour':
+        return list(buckets.order_by('hour').values_list('hour', 'count'))
+    return list(
+        buckets.annotate(period=TruncDate('hour', tzinfo=timezone.get_current_timezone()))
+        .values('period')
+        .annotate(total=Sum('count'))
+        .order_by('period')
+        .values_list('period', 'total')
+    )
+
+
+def check_tallies(survey, counts):
+    """Compare les compteurs aux décomptes `counts` et retourne la liste des écarts."""
+    stored = read_tallies(survey)
+    errors = []
+    if stored[0] != counts[0]:
+        errors.append(f"participants : {stored[0]} enregistré(s), {counts[0]} réel(s)")
+    for label, stored_counts, actual_counts in (
+        ('question', stored[1], counts[1]),
+        ('choix', stored[2], counts[2]),
+    ):
+        for key in sorted(set(stored_counts) | set(actual_counts)):
+            expected = actual_counts.get(key, 0)
+            if stored_counts.get(key, 0) != expected:
+                errors.append(f"{label} #{key} : {stored_counts.get(key, 0)} enregistré(s), {expected} réel(s)")
+    return errors
+
+
+@transaction.atomic
+def rebuild_tallies(survey, counts):
+    """Remplace tous les compteurs d'un sondage par les décomptes `counts`."""
+    participants, question_counts, choice_counts = counts
+
+    SurveyTally.objects.update_or_create(survey=survey, defaults={'participants': participants})
+    QuestionTally.objects.filter(survey=survey).delete()
+    ChoiceTally.objects.filter(survey=survey).delete()
+
+    QuestionTally.objects.bulk_create([
+        QuestionTally(question_id=question_id, survey=survey, answers=question_counts.get(question_id, 0))
+        for question_id in Question.objects.filter(survey=survey).values_list('id', flat=True)
+    ])
+    ChoiceTally.objects.bulk_create([
+        ChoiceTally(choice_id=choice_id, survey=survey, count=choice_counts.get(choice_id, 0))
+        for choice_id in Choice.objects.filter(question__survey=survey).values_list('id', flat=True)
+    ])
+
+
+def count_terms(survey):
+    """Recompte les fréquences de termes d'un sondage à partir des réponses texte."""
+    counts = Counter()
+    answers = Answer.objects.filter(
+        question__survey=survey,
+        question__question_type='text'
+    ).exclude(text_answer__isnull=True).exclude(text_answer='')
+    for question_id, text in answers.values_list('question_id', 'text_answer').iterator():
+        counts.update((question_id, term) for term in extract_terms(text))
+    return counts
+
+
+def check_terms(survey, counts):
+    """Compare les fréquences enregistrées aux décomptes `counts` et retourne les écarts."""
+    stored = {
+        (question_id, term): count
+        for question_id, term, count in TermCount.objects.filter(question__survey=survey)
+        .exclude(count=0)
+        .values_list('question_id', 'term', 'count')
+    }
+    errors = []
+    for key in sorted(set(stored) | set(counts)):
+        if stored.get(key, 0) != counts.get(key, 0):
+            question_id, term = key
+            errors.append(
+                f"terme « {term} » (question #{question_id}) : "
+                f"{stored.get(key, 0)} enregistré(s), {counts.get(key, 0)} réel(s)"
+            )
+    return errors
+
+
+@transaction.atomic
+def rebuild_terms(survey, counts):
+    """Remplace les fréquences de termes d'un sondage par les décomptes `counts`."""
+    TermCount.objects.filter(question__survey=survey).delete()
+    TermCount.objects.bulk_create([
+        TermCount(question_id=question_id, term=term, count=count)
+        for (question_id, term), count in counts.items()
+    ], batch_size=500)
+
+
+def count_buckets(survey):
+    """Recompte les compteurs horaires d'un sondage à partir des dates de soumission.
+
+    Retourne trois dictionnaires : participations par heure, réponses par
+    (question, heure) et sélections par (choix, heure).
+    """
+    responses = Response.objects.filter(survey=survey).annotate(
+        bucket=TruncHour('submitted_at', tzinfo=dt_timezone.utc)
+    )
+    participations = dict(
+        responses.values('bucket').annotate(total=Count('id')).values_list('bucket', 'total')
+    )
+    answers = Answer.objects.filter(response__survey=survey).annotate(
+        bucket=TruncHour('response__submitted_at', tzinfo=dt_timezone.utc)
+    )
+    questions = {
+        (question_id, hour): total
+        for question_id, hour, total in answers.values('question_id', 'bucket')
+        .annotate(total=Count('id'))
+        .values_list('question_id', 'bucket', 'total')
+    }
+    selections = Answer.selected_choices.through.objects.filter(answer__response__survey=survey).annotate(
+        bucket=TruncHour('answer__response__submitted_at', tzinfo=dt_timezone.utc)
+    )
+    choices = {
+        (choice_id, hour): total
+        for choice_id, hour, total in selections.values('choice_id', 'bucket')
+        .annotate(total=Count('id'))
+        .values_list('choice_id', 'bucket', 'total')
+    }
+    return participations, questions, choices
+
+
+def check_buckets(survey, counts):
+    """Compare les compteurs horaires aux décomptes `counts` et retourne les écarts."""
+    participations, questions, choices = counts
+    stored = (
+        dict(ParticipationBucket.objects.filter(survey=survey).values_list('hour', 'count')),
+        {
+            (question_id, hour): count
+            for question_id, hour, count in QuestionBucket.objects.filter(survey=survey)
+            .values_list('question_id', 'hour', 'count')
+        },
+        {
+            (choice_id, hour): count
+            for choice_id, hour, count in ChoiceBucket.objects.filter(survey=survey)
+            .values_list('choice_id', 'hour', 'count')
+        },
+    )
+    errors = []
+    for label, stored_counts, actual_counts in zip(
+        ('participations', 'réponses', 'sélections'),
+        stored,
+        (participations, questions, choices),
+    ):
+        for key in set(stored_counts) | set(actual_counts):
+            if stored_counts.get(key, 0) != actual_counts.get(key, 0):
+                errors.append(
+                    f"{label} horaires {key} : "
+                    f"{stored_counts.get(key, 0)} enregistré(s), {actual_counts.get(key, 0)} réel(s)"
+                )
+    return sorted(errors)
+
+
+@transaction.atomic
+def rebuild_buckets(survey, counts):
+    """Remplace les compteurs horaires d'un sondage par les décomptes `counts`."""
+    participations, questions, choices = counts
+    ParticipationBucket.objects.filter(survey=survey).delete()
+    QuestionBucket.objects.filter(survey=survey).delete()
+    ChoiceBucket.objects.filter(survey=survey).delete()
+
+    ParticipationBucket.objects.bulk_create([
+        ParticipationBucket(survey=survey, hour=hour, count=count)
+        for hour, count in participations.items()
+    ], batch_size=500)
+    QuestionBucket.objects.bulk_create([
+        QuestionBucket(question_id=question_id, survey=survey, hour=hour, count=count)
+        for (question_id, hour), count in questions.items()
+    ], batch_size=500)
+    ChoiceBucket.objects.bulk_create([
+        ChoiceBucket(choice_id=choice_id, survey=survey, hour=hour, count=count)
+        for (choice_id, hour), count in choices.items()
+    ], batch_size=500)
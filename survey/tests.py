@@ -1,9 +1,36 @@
-from django.test import TestCase, Client
+from django.test import TestCase, TransactionTestCase, Client, RequestFactory, override_settings
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from django.utils import timezone
-from datetime import timedelta
-from .models import Survey, Question, Choice, Response, Answer
+from datetime import datetime, timedelta
+import asyncio
+import csv
+from concurrent.futures import ThreadPoolExecutor
+import json
+from io import StringIO
+from unittest import mock
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from .models import (
+    Survey, Question, Choice, Response, Answer, ChoiceBucket, ChoiceTally, ParticipationBucket,
+    QuestionTally, SurveyTally, TermCount
+)
+from django.db import IntegrityError, connection
+from django.test.utils import CaptureQueriesContext
+from .results import aggregate_counts, collect_text_answers, first_text_pages_sql, segment_responses, survey_results, text_answers_page
+from .admission import AdmissionLimiter
+from .availability import answered_survey_ids, unfinished_surveys
+from .drafts import draft_key
+from .live import SurveyFeed, live_events
+from .schema import get_schema
+from .search import search_text_answers
+from .services import build_answer_forms, clean_answers, save_submission, save_submissions
+from .tallies import participation_series, read_tallies, read_top_terms, read_window_tallies
+from .textstats import extract_terms
+from .views import SurveyListView, SurveyParticipateView
+from .writer import SubmissionWriter, write_batch
 
 class SurveyModelTests(TestCase):
     def setUp(self):
@@ -72,6 +99,8 @@ class SurveyModelTests(TestCase):
 
 class SurveyViewTests(TestCase):
     def setUp(self):
+        # Compteurs par statut mis en cache par la liste des sondages
+        cache.clear()
         self.client = Client()
         self.user = get_user_model().objects.create_user(
             username='testuser',
@@ -132,6 +161,60 @@ class SurveyViewTests(TestCase):
         )
         self.assertEqual(response.status_code, 403)  # Forbidden
 
+class KeysetPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.user = get_user_model().objects.create_user(username='testuser', password='testpass123')
+        for number in range(25):
+            Survey.objects.create(
+                title=f'Sondage {number:02d}',
+                description='Description',
+                start_date=timezone.now(),
+                end_date=timezone.now() + timedelta(days=7),
+                creator=self.user,
+                status='published'
+            )
+        # Dates identiques : l'id départage les sondages
+        Survey.objects.update(created_at=timezone.now())
+        self.client.login(username='testuser', password='testpass123')
+
+    def walk(self, url):
+        titles = []
+        pages = []
+        while url:
+            with CaptureQueriesContext(connection) as queries:
+                response = self.client.get(url)
+            self.assertFalse(any('OFFSET' in query['sql'] for query in queries))
+            titles += [survey.title for survey in response.context['surveys']]
+            pages.append(response)
+            url = response.context['next_url'] and reverse('surveys:survey_list') + response.context['next_url']
+        return titles, pages
+
+    def test_cursor_walks_every_survey_once(self):
+        titles, pages = self.walk(reverse('surveys:survey_list'))
+        self.assertEqual(titles, [f'Sondage {number:02d}' for number in reversed(range(25))])
+        self.assertEqual(len(pages), 3)
+
+        response = self.client.get(reverse('surveys:survey_list') + pages[2].context['previous_url'])
+        self.assertEqual(
+            [survey.title for survey in response.context['surveys']],
+            [survey.title for survey in pages[1].context['surveys']]
+        )
+        self.assertIsNotNone(response.context['previous_url'])
+
+    def test_invalid_cursor_shows_first_page(self):
+        response = self.client.get(reverse('surveys:survey_list') + '?cursor=falsifie')
+        self.assertEqual(response.context['surveys'][0].title, 'Sondage 24')
+        self.assertIsNone(response.context['previous_url'])
+
+    def test_available_surveys_paginated(self):
+        response = self.client.get(reverse('surveys:available_surveys'))
+        self.assertEqual(len(response.context['surveys']), 10)
+        self.assertEqual(response.context['total_available'], 25)
+        self.assertTrue(response.context['page'].has_next)
+
+
 class SurveyParticipationTests(TestCase):
     def setUp(self):
         self.client = Client()
@@ -165,7 +248,7 @@ class SurveyParticipationTests(TestCase):
         response = self.client.post(
             reverse('surveys:participate', kwargs={'pk': self.survey.pk}),
             {
-                f'question_{self.question.id}': self.choice.id
+                f'question_{self.question.id}-single_choice': self.choice.id
             }
         )
         self.assertEqual(response.status_code, 302)  # Redirection après soumission
@@ -183,7 +266,7 @@ class SurveyParticipationTests(TestCase):
         self.client.post(
             reverse('surveys:participate', kwargs={'pk': self.survey.pk}),
             {
-                f'question_{self.question.id}': self.choice.id
+                f'question_{self.question.id}-single_choice': self.choice.id
             }
         )
         
@@ -193,8 +276,16 @@ class SurveyParticipationTests(TestCase):
         )
         self.assertEqual(response.status_code, 403)  # Forbidden
 
+    def test_missing_required_answer(self):
+        self.client.login(username='testuser', password='testpass123')
+        response = self.client.post(reverse('surveys:participate', kwargs={'pk': self.survey.pk}), {})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Response.objects.filter(survey=self.survey).exists())
+
 class SurveySearchTests(TestCase):
     def setUp(self):
+        # Compteurs par statut mis en cache par la liste des sondages
+        cache.clear()
         self.client = Client()
         self.user = get_user_model().objects.create_user(
             username='testuser',
@@ -244,3 +335,1210 @@ class SurveySearchTests(TestCase):
         )
         self.assertContains(response, 'Python Survey')
         self.assertContains(response, 'Django Survey')
+
+    def test_date_filter_is_half_open(self):
+        today = timezone.localdate()
+        tomorrow = timezone.make_aware(datetime.combine(today + timedelta(days=1), datetime.min.time()))
+        Survey.objects.filter(pk=self.survey2.pk).update(created_at=tomorrow)
+        Survey.objects.filter(pk=self.survey1.pk).update(created_at=tomorrow - timedelta(microseconds=1))
+        self.client.login(username='testuser', password='testpass123')
+        response = self.client.get(reverse('surveys:survey_list') + f'?date_from={today}&date_to={today}')
+        self.assertEqual([survey.title for survey in response.context['surveys']], ['Python Survey'])
+
+    def test_search_prefix_and_ranking(self):
+        Survey.objects.create(
+            title='Langages',
+            description='Python, Python et encore Python',
+            start_date=timezone.now(),
+            end_date=timezone.now() + timedelta(days=7),
+            creator=self.user
+        )
+        self.client.login(username='testuser', password='testpass123')
+        response = self.client.get(reverse('surveys:survey_list') + '?search=pyth')
+        # Une correspondance dans le titre passe avant une correspondance dans la description
+        self.assertEqual([survey.title for survey in response.context['surveys']], ['Python Survey', 'Langages'])
+
+    def test_search_index_follows_changes(self):
+        self.survey2.title = 'Flask Survey'
+        self.survey2.description = 'A survey about Flask'
+        self.survey2.save()
+        self.survey1.delete()
+        self.client.login(username='testuser', password='testpass123')
+        url = reverse('surveys:survey_list')
+        self.assertContains(self.client.get(url + '?search=flask'), 'Flask Survey')
+        self.assertEqual(list(self.client.get(url + '?search=django').context['surveys']), [])
+        self.assertEqual(list(self.client.get(url + '?search=python').context['surveys']), [])
+
+
+class SurveyListCountersTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(username='testuser', password='testpass123')
+        self.survey1, self.survey2 = [
+            Survey.objects.create(
+                title=f'{status} Survey',
+                description='Description',
+                start_date=timezone.now(),
+                end_date=timezone.now() + timedelta(days=7),
+                creator=self.user,
+                status=status
+            )
+            for status in ('published', 'draft')
+        ]
+
+    def survey_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        return response, [query['sql'] for query in queries if 'survey_survey' in query['sql']]
+
+    def test_filtered_counters_in_one_aggregate(self):
+        self.client.login(username='testuser', password='testpass123')
+        response, queries = self.survey_queries(reverse('surveys:survey_list') + '?search=Survey')
+        # Un agrégat pour les compteurs et la pagination, une requête pour la page
+        self.assertEqual(len(queries), 2)
+        self.assertEqual(
+            (response.context['total_surveys'], response.context['published_surveys'], response.context['draft_surveys']),
+            (2, 1, 1)
+        )
+
+    def test_unfiltered_counters_cached_and_maintained(self):
+        self.client.login(username='testuser', password='testpass123')
+        url = reverse('surveys:survey_list')
+        self.survey_queries(url)
+        response, queries = self.survey_queries(url)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(response.context['total_surveys'], 2)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.survey2.status = 'published'
+            self.survey2.save()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.survey1.delete()
+        response, queries = self.survey_queries(url)
+        self.assertEqual(len(queries), 1)
+        self.assertEqual(
+            (response.context['total_surveys'], response.context['published_surveys'], response.context['draft_surveys']),
+            (1, 1, 0)
+        )
+
+
+class SurveyResultsTestCase(TestCase):
+    """Sondage publié à deux questions à choix, partagé par les tests de résultats."""
+
+    def setUp(self):
+        self.client = Client()
+        self.creator = get_user_model().objects.create_user(
+            username='creator',
+            password='testpass123'
+        )
+        self.user = get_user_model().objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.survey = Survey.objects.create(
+            title='Tally Survey',
+            description='Test Description',
+            start_date=timezone.now(),
+            end_date=timezone.now() + timedelta(days=7),
+            creator=self.creator,
+            status='published'
+        )
+        self.single = Question.objects.create(
+            survey=self.survey,
+            text='Single',
+            question_type='single',
+            required=True
+        )
+        self.yes = Choice.objects.create(question=self.single, text='Oui')
+        self.no = Choice.objects.create(question=self.single, text='Non')
+        self.multiple = Question.objects.create(
+            survey=self.survey,
+            text='Multiple',
+            question_type='multiple',
+            order=1
+        )
+        self.red = Choice.objects.create(question=self.multiple, text='Rouge')
+        self.blue = Choice.objects.create(question=self.multiple, text='Bleu')
+
+    def participate(self, username, data):
+        self.client.login(username=username, password='testpass123')
+        return self.client.post(
+            reverse('surveys:participate', kwargs={'pk': self.survey.pk}),
+            data
+        )
+
+
+class SurveyTallyTests(SurveyResultsTestCase):
+    def test_submission_updates_tallies(self):
+        response = self.participate('testuser', {
+            f'question_{self.single.id}-single_choice': self.yes.id,
+            f'question_{self.multiple.id}-selected_choices': [self.red.id, self.blue.id],
+        })
+        self.assertEqual(response.status_code, 302)
+
+        participants, question_counts, choice_counts = read_tallies(self.survey)
+        self.assertEqual(participants, 1)
+        self.assertEqual(question_counts, {self.single.id: 1, self.multiple.id: 1})
+        self.assertEqual(choice_counts, {self.yes.id: 1, self.red.id: 1, self.blue.id: 1})
+
+        # Le choix unique est bien enregistré sur la réponse
+        answer = Answer.objects.get(question=self.single)
+        self.assertEqual(list(answer.selected_choices.all()), [self.yes])
+
+    def test_results_are_read_from_tallies(self):
+        self.participate('testuser', {f'question_{self.single.id}-single_choice': self.no.id})
+        self.client.login(username='creator', password='testpass123')
+        response = self.client.get(reverse('surveys:survey_results', kwargs={'pk': self.survey.pk}))
+
+        self.assertEqual(response.context['total_participants'], 1)
+        single_stats = response.context['questions_stats'][0]
+        self.assertEqual(single_stats['total_responses'], 1)
+        self.assertEqual(
+            [(stat['choice'], stat['count'], stat['percentage']) for stat in single_stats['choices_stats']],
+            [(self.yes, 0, 0), (self.no, 1, 100.0)]
+        )
+
+    def test_rebuild_tallies_command(self):
+        self.participate('testuser', {f'question_{self.single.id}-single_choice': self.yes.id})
+        ChoiceTally.objects.filter(choice=self.yes).update(count=5)
+        SurveyTally.objects.filter(survey=self.survey).update(participants=0)
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_tallies', self.survey.pk, '--check', stdout=StringIO())
+
+        call_command('rebuild_tallies', self.survey.pk, stdout=StringIO())
+        call_command('rebuild_tallies', self.survey.pk, '--check', stdout=StringIO())
+        self.assertEqual(SurveyTally.objects.get(survey=self.survey).participants, 1)
+        self.assertEqual(ChoiceTally.objects.get(choice=self.yes).count, 1)
+        self.assertEqual(QuestionTally.objects.get(question=self.multiple).answers, 1)
+
+    def test_deleted_responses_are_retracted(self):
+        comment = Question.objects.create(survey=self.survey, text='Commentaire', question_type='text', order=2)
+        other = get_user_model().objects.create_user(username='other', password='testpass123')
+        for username, choice in (('testuser', self.yes), ('other', self.no)):
+            self.participate(username, {
+                f'question_{self.single.id}-single_choice': choice.id,
+                f'question_{self.multiple.id}-selected_choices': [self.red.id],
+                f'question_{comment.id}-text_answer': 'Service rapide',
+            })
+
+        # Suppression directe, puis en cascade avec le participant
+        Response.objects.get(respondent=self.user).delete()
+        call_command('rebuild_tallies', self.survey.pk, '--check', stdout=StringIO())
+        other.delete()
+        call_command('rebuild_tallies', self.survey.pk, '--check', stdout=StringIO())
+
+        participants, question_counts, choice_counts = read_tallies(self.survey)
+        self.assertEqual(participants, 0)
+        self.assertFalse(any(question_counts.values()) or any(choice_counts.values()))
+        self.assertNotIn(comment.id, read_top_terms(self.survey))
+
+
+class SurveyEngineTestCase(TestCase):
+    """Sondages générés avec un nombre variable de questions, pour les tests de nombre de requêtes."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+
+    def create_survey(self, question_count):
+        survey = Survey.objects.create(
+            title='Engine Survey',
+            description='Test Description',
+            start_date=timezone.now(),
+            end_date=timezone.now() + timedelta(days=7),
+            creator=self.user,
+            status='published'
+        )
+        for i in range(question_count):
+            question = Question.objects.create(survey=survey, text=f'Q{i}', question_type='multiple', order=i)
+            first = Choice.objects.create(question=question, text='A')
+            Choice.objects.create(question=question, text='B')
+            response = Response.objects.create(
+                survey=survey,
+                respondent=get_user_model().objects.create_user(username=f'r{survey.pk}-{i}')
+            )
+            answer = Answer.objects.create(response=response, question=question)
+            answer.selected_choices.add(first)
+        Question.objects.create(survey=survey, text='Texte', question_type='text', order=question_count)
+        return survey
+
+    def count_queries(self, func, *args):
+        with CaptureQueriesContext(connection) as queries:
+            func(*args)
+        return len(queries)
+
+
+class SurveyResultsEngineTests(SurveyEngineTestCase):
+    def test_query_count_does_not_grow_with_questions(self):
+        small = self.create_survey(1)
+        large = self.create_survey(6)
+        self.assertEqual(
+            self.count_queries(survey_results, small),
+            self.count_queries(survey_results, large)
+        )
+        self.assertEqual(
+            self.count_queries(aggregate_counts, small),
+            self.count_queries(aggregate_counts, large)
+        )
+
+    def test_aggregated_stats_match_raw_answers(self):
+        survey = self.create_survey(3)
+        participants, question_counts, choice_counts = aggregate_counts(survey)
+        self.assertEqual(participants, 3)
+        self.assertEqual(sorted(question_counts.values()), [1, 1, 1])
+        self.assertEqual(sorted(choice_counts.values()), [1, 1, 1])
+
+        participants, questions_stats = survey_results(survey, Response.objects.filter(survey=survey))
+        self.assertEqual(participants, 3)
+        self.assertEqual(questions_stats[0]['choices_stats'][0]['percentage'], 100.0)
+        self.assertEqual(questions_stats[-1]['text_answers'], [])
+
+
+class SubmissionServiceTests(SurveyEngineTestCase):
+    def submit(self, survey, username):
+        answers = [
+            (question, list(question.choices.all()[:1]), 'Réponse' if question.question_type == 'text' else None)
+            for question in survey.questions.prefetch_related('choices')
+        ]
+        respondent = get_user_model().objects.create_user(username=username)
+        with CaptureQueriesContext(connection) as queries:
+            save_submission(survey, respondent, answers)
+        return len(queries)
+
+    def test_query_count_does_not_grow_with_questions(self):
+        self.assertEqual(
+            self.submit(self.create_survey(1), 'small'),
+            self.submit(self.create_survey(8), 'large')
+        )
+
+    def test_answers_and_choices_saved(self):
+        survey = self.create_survey(2)
+        self.submit(survey, 'participant')
+        response = Response.objects.get(survey=survey, respondent__username='participant')
+        answers = response.answers.order_by('question__order')
+        self.assertEqual([answer.selected_choices.get().text for answer in answers[:2]], ['A', 'A'])
+        self.assertEqual(answers[2].text_answer, 'Réponse')
+        self.assertEqual(read_tallies(survey)[2][answers[0].selected_choices.get().pk], 1)
+
+    def test_without_bulk_insert_returning(self):
+        # SQLite < 3.35 : bulk_create ne renvoie pas les clés primaires
+        survey = self.create_survey(2)
+        question = survey.questions.prefetch_related('choices').first()
+        answers = [(question, list(question.choices.all()[:1]), None)]
+        respondents = [get_user_model().objects.create_user(username=f'old{i}') for i in range(3)]
+        with mock.patch.object(type(connection.features), 'can_return_rows_from_bulk_insert', False):
+            save_submission(survey, respondents[0], answers)
+            responses = save_submissions(survey, [(respondent, None, answers) for respondent in respondents[1:]])
+        self.assertTrue(all(response.pk for response in responses))
+        self.assertEqual(Answer.selected_choices.through.objects.filter(answer__response__respondent__in=respondents).count(), 3)
+        self.assertEqual(read_tallies(survey)[0], 3)
+
+
+class SurveySchemaTests(SurveyResultsTestCase):
+    def test_schema_cached_until_survey_changes(self):
+        schema = get_schema(self.survey)
+        self.assertEqual([question.text for question in schema.questions], ['Single', 'Multiple'])
+        self.assertEqual([choice.text for choice in schema.questions[0].choices], ['Oui', 'Non'])
+        with self.assertRaises(AttributeError):
+            schema.questions[0].text = 'Autre'
+
+        with self.assertNumQueries(0):
+            self.assertIs(get_schema(self.survey), schema)
+
+        Choice.objects.create(question=self.multiple, text='Vert')
+        self.survey.refresh_from_db()
+        schema = get_schema(self.survey)
+        self.assertEqual([choice.text for choice in schema.questions[1].choices], ['Rouge', 'Bleu', 'Vert'])
+
+    def test_schema_cache_is_bounded(self):
+        other = Survey.objects.create(
+            title='Autre', start_date=timezone.now(), end_date=timezone.now() + timedelta(days=7),
+            creator=self.creator, status='published'
+        )
+        with mock.patch('survey.schema.SCHEMA_CACHE_SIZE', 1):
+            schema = get_schema(self.survey)
+            get_schema(other)
+            # Le schéma le moins récemment utilisé a été écarté
+            self.assertIsNot(get_schema(self.survey), schema)
+
+    def test_forms_validate_without_queries(self):
+        schema = get_schema(self.survey)
+        data = {
+            f'question_{self.single.id}-single_choice': str(self.no.id),
+            f'question_{self.multiple.id}-selected_choices': [str(self.blue.id), str(self.red.id)],
+        }
+        with self.assertNumQueries(0):
+            answers = clean_answers(build_answer_forms(schema.questions, data=data))
+        self.assertEqual(
+            [[choice.id for choice in choices] for _, choices, _ in answers],
+            [[self.no.id], [self.red.id, self.blue.id]]
+        )
+
+        # Un choix d'une autre question est refusé
+        data[f'question_{self.single.id}-single_choice'] = str(self.red.id)
+        self.assertIsNone(clean_answers(build_answer_forms(schema.questions, data=data)))
+
+
+class BranchingTests(SurveyResultsTestCase):
+    """Question texte obligatoire affichée seulement après « Non » à la première question."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.followup = Question.objects.create(
+            survey=self.survey,
+            text='Pourquoi ?',
+            question_type='text',
+            required=True,
+            order=2
+        )
+        self.followup.condition_choices.add(self.no)
+        self.survey.refresh_from_db()
+
+    def test_visibility_compiled_into_schema(self):
+        schema = get_schema(self.survey)
+        self.assertEqual(schema.questions[2].conditions, (self.no.id,))
+        with self.assertNumQueries(0):
+            hidden = schema.visible_question_ids({str(self.single.id): self.yes.id})
+            shown = schema.visible_question_ids({str(self.single.id): self.no.id})
+        self.assertNotIn(self.followup.id, hidden)
+        self.assertIn(self.followup.id, shown)
+        # Un choix déclencheur attribué à une autre question est ignoré
+        self.assertNotIn(self.followup.id, schema.visible_question_ids({str(self.multiple.id): [self.no.id]}))
+
+    def test_hidden_question_skipped_on_submission(self):
+        response = self.participate('testuser', {
+            f'question_{self.single.id}-single_choice': self.yes.id,
+            f'question_{self.followup.id}-text_answer': 'Ignorée',
+        })
+        self.assertEqual(response.status_code, 302)
+        saved = Response.objects.get(survey=self.survey, respondent=self.user)
+        self.assertFalse(saved.answers.filter(question=self.followup).exists())
+
+    def test_shown_question_required(self):
+        response = self.participate('testuser', {f'question_{self.single.id}-single_choice': self.no.id})
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Response.objects.filter(survey=self.survey).exists())
+
+        response = self.participate('testuser', {
+            f'question_{self.single.id}-single_choice': self.no.id,
+            f'question_{self.followup.id}-text_answer': 'Trop long',
+        })
+        self.assertEqual(response.status_code, 302)
+
+    def test_publish_rejects_condition_on_later_question(self):
+        self.survey.status = 'draft'
+        self.survey.save()
+        self.single.condition_choices.add(self.red)
+        self.client.login(username='creator', password='testpass123')
+        self.client.post(reverse('surveys:survey_publish', kwargs={'pk': self.survey.pk}))
+        self.survey.refresh_from_db()
+        self.assertEqual(self.survey.status, 'draft')
+
+        self.single.condition_choices.clear()
+        self.client.post(reverse('surveys:survey_publish', kwargs={'pk': self.survey.pk}))
+        self.survey.refresh_from_db()
+        self.assertEqual(self.survey.status, 'published')
+
+
+class QueryPlanTests(SurveyResultsTestCase):
+    """Les requêtes des listes, de la participation et des résultats utilisent un index."""
+
+    def query_plan(self, queryset):
+        sql, params = queryset.query.sql_with_params()
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            return [row[-1] for row in cursor.fetchall()]
+
+    def assertUsesIndex(self, queryset, index):
+        """`index` : nom de l'index ou colonnes recherchées, tels qu'affichés par SQLite"""
+        plan = self.query_plan(queryset)
+        self.assertTrue(any(detail.startswith('SEARCH') and index in detail for detail in plan), plan)
+
+    def list_queryset(self, view_class, query=''):
+        request = RequestFactory().get('/' + query)
+        request.user = self.user
+        view = view_class()
+        view.setup(request)
+        return view.get_queryset()
+
+    def test_list_queries(self):
+        self.assertUsesIndex(unfinished_surveys(), 'survey_status_dates_idx')
+        self.assertUsesIndex(self.list_queryset(SurveyListView, '?status=draft'), 'survey_status_dates_idx')
+        today = timezone.localdate()
+        self.assertUsesIndex(
+            self.list_queryset(SurveyListView, f'?date_from={today}&date_to={today}'),
+            'survey_created_idx'
+        )
+        self.assertUsesIndex(
+            Survey.objects.filter(creator=self.creator).order_by('-created_at'),
+            'survey_creator_created_idx'
+        )
+
+    def test_participation_queries(self):
+        self.assertUsesIndex(
+            Response.objects.filter(survey=self.survey, respondent=self.user),
+            'survey_id=? AND respondent_id=?'
+        )
+        self.assertUsesIndex(Response.objects.filter(respondent=self.user), 'respondent_id=?')
+
+    def test_results_queries(self):
+        through = Answer.selected_choices.through
+        self.assertUsesIndex(
+            through.objects.filter(choice=self.yes).values('answer_id'), 'survey_answer_choices_choice_answer_idx'
+        )
+        self.assertUsesIndex(
+            segment_responses(self.survey, [self.yes.id]), 'survey_answer_choices_choice_answer_idx'
+        )
+        self.assertUsesIndex(
+            Answer.objects.filter(question=self.single).order_by('id'),
+            'question_id=?'
+        )
+
+    def test_first_text_pages_are_bounded(self):
+        sql, params = first_text_pages_sql([self.single.id, self.multiple.id])
+        with connection.cursor() as cursor:
+            cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+            plan = [row[-1] for row in cursor.fetchall()]
+        # Une recherche par index et par question, sans tri de toutes les réponses
+        self.assertEqual(sum(detail.startswith('SEARCH') and 'question_id=?' in detail for detail in plan), 2, plan)
+        self.assertFalse(any('TEMP B-TREE' in detail for detail in plan), plan)
+
+
+class GroupCommitTests(SurveyResultsTestCase):
+    def answers(self, choice):
+        schema = get_schema(self.survey)
+        return [(schema.questions[0], [schema.questions[0].get_choice(choice.id)], None)]
+
+    def test_batch_isolates_failed_submissions(self):
+        other = get_user_model().objects.create_user(username='other', password='testpass123')
+        results = write_batch([
+            (self.survey, self.user, self.answers(self.yes), None),
+            (self.survey, self.user, self.answers(self.no), None),
+            (self.survey, other, self.answers(self.no), None),
+        ])
+        self.assertIsInstance(results[0], Response)
+        self.assertIsInstance(results[1], IntegrityError)
+        self.assertIsInstance(results[2], Response)
+        self.assertEqual(read_tallies(self.survey)[2], {self.yes.id: 1, self.no.id: 1})
+
+    @override_settings(SURVEY_GROUP_COMMIT=True)
+    def test_participation_through_writer(self):
+        with mock.patch('survey.writer.get_submission_writer') as get_writer:
+            get_writer.return_value.submit.side_effect = lambda *item: write_batch([item])[0]
+            response = self.participate('testuser', {f'question_{self.single.id}-single_choice': self.yes.id})
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(get_writer.return_value.submit.call_count, 1)
+        self.assertTrue(Response.objects.filter(survey=self.survey, respondent=self.user).exists())
+
+
+class SubmissionWriterThreadTests(TransactionTestCase):
+    def setUp(self):
+        creator = get_user_model().objects.create_user(username='creator')
+        self.survey = Survey.objects.create(
+            title='Writer Survey',
+            description='Test Description',
+            start_date=timezone.now(),
+            end_date=timezone.now() + timedelta(days=7),
+            creator=creator,
+            status='published'
+        )
+        question = Question.objects.create(survey=self.survey, text='Q', question_type='single')
+        choice = Choice.objects.create(question=question, text='A')
+        schema = get_schema(self.survey)
+        self.answers = [(schema.questions[0], [schema.questions[0].get_choice(choice.id)], None)]
+
+    def test_concurrent_submissions_grouped(self):
+        users = [get_user_model().objects.create_user(username=f'user{i}') for i in range(5)]
+        writer = SubmissionWriter(batch_size=10, max_latency=0.2)
+        with mock.patch('survey.writer.write_batch', wraps=write_batch) as batches:
+            with ThreadPoolExecutor(max_workers=5) as pool:
+                results = list(pool.map(lambda user: writer.submit(self.survey, user, self.answers), users))
+        self.assertTrue(all(isinstance(result, Response) for result in results))
+        self.assertLess(batches.call_count, len(users))
+        self.assertEqual(read_tallies(self.survey)[0], 5)
+
+    def test_timed_out_submission_is_never_written(self):
+        late, other = [get_user_model().objects.create_user(username=name) for name in ('late', 'other')]
+        writer = SubmissionWriter(batch_size=10, max_latency=0.01)
+        # Thread d'écriture arrêté : la participation attend au-delà du délai
+        with mock.patch.object(writer, 'ensure_started'), mock.patch('survey.writer.WRITER_RESULT_TIMEOUT', 0.05):
+            with self.assertRaises(TimeoutError):
+                writer.submit(self.survey, late, self.answers)
+        self.assertIsInstance(writer.submit(self.survey, other, self.answers), Response)
+        self.assertEqual(list(Response.objects.values_list('respondent__username', flat=True)), ['other'])
+
+
+class SubmissionApiTests(SurveyResultsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.url = reverse('surveys:api_submissions', kwargs={'pk': self.survey.pk})
+
+    def post_json(self, username, payload):
+        self.client.login(username=username, password='testpass123')
+        return self.client.post(self.url, json.dumps(payload), content_type='application/json')
+
+    def test_single_submission(self):
+        response = self.post_json('testuser', {'answers': {
+            str(self.single.id): self.yes.id,
+            str(self.multiple.id): [self.red.id, self.blue.id],
+        }})
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(read_tallies(self.survey)[2], {self.yes.id: 1, self.red.id: 1, self.blue.id: 1})
+
+        response = self.post_json('testuser', {'answers': {str(self.single.id): self.yes.id}})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('respondent', response.json()['errors'])
+
+    def test_batch_submission(self):
+        self.survey.anonymous = True
+        self.survey.save()
+        submissions = [
+            {'respondent_token': f'kiosk{i}', 'answers': {str(self.single.id): self.yes.id if i % 2 else self.no.id}}
+            for i in range(20)
+        ]
+        submissions += [
+            {'respondent_token': 'kiosk0', 'answers': {str(self.single.id): self.yes.id}},
+            {'respondent_token': 'x' * 65, 'answers': {str(self.single.id): self.yes.id}},
+            {'answers': {str(self.single.id): self.red.id}},
+        ]
+
+        # Réservé au créateur
+        self.assertEqual(self.post_json('testuser', {'submissions': submissions}).status_code, 403)
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.post_json('creator', {'submissions': submissions})
+        self.assertLess(len(queries), 60)
+        data = response.json()
+        self.assertEqual(data['created'], 20)
+        self.assertEqual([result['status'] for result in data['results'][20:]], ['invalid'] * 3)
+        self.assertIn(str(self.single.id), data['results'][22]['errors'])
+        self.assertEqual(read_tallies(self.survey)[0], 20)
+        self.assertEqual(read_tallies(self.survey)[2], {self.yes.id: 10, self.no.id: 10})
+        self.assertFalse(Response.objects.filter(respondent__isnull=False).exists())
+        call_command('rebuild_tallies', self.survey.pk, '--check', stdout=StringIO())
+
+    def test_batch_cannot_answer_for_other_users(self):
+        self.survey.anonymous = True
+        self.survey.save()
+        response = self.post_json('creator', {'submissions': [
+            {'respondent': 'testuser', 'answers': {str(self.single.id): self.yes.id}},
+        ]})
+        self.assertEqual(response.json()['created'], 0)
+        self.assertIn('respondent', response.json()['results'][0]['errors'])
+        self.assertFalse(Response.objects.exists())
+
+        # Lots refusés pour un sondage nominatif
+        self.survey.anonymous = False
+        self.survey.save()
+        response = self.post_json('creator', {'submissions': [
+            {'answers': {str(self.single.id): self.yes.id}},
+        ]})
+        self.assertEqual(response.status_code, 409)
+
+
+class SurveyObjectQueriesTests(SurveyResultsTestCase):
+    def table_queries(self, url, table):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return sum(f'FROM "{table}"' in query['sql'] for query in queries.captured_queries)
+
+    def test_survey_loaded_once_per_request(self):
+        self.client.login(username='testuser', password='testpass123')
+        participate = reverse('surveys:participate', kwargs={'pk': self.survey.pk})
+        self.assertEqual(self.table_queries(participate, 'survey_survey'), 1)
+
+        self.client.login(username='creator', password='testpass123')
+        results = reverse('surveys:survey_results', kwargs={'pk': self.survey.pk})
+        self.assertEqual(self.table_queries(results, 'survey_survey'), 1)
+
+        self.survey.status = 'draft'
+        self.survey.save()
+        choices = reverse('surveys:question_choices', kwargs={'pk': self.single.pk})
+        self.assertEqual(self.table_queries(choices, 'survey_question'), 1)
+
+    def test_detail_queries_do_not_grow_with_questions(self):
+        self.client.login(username='creator', password='testpass123')
+        url = reverse('surveys:survey_detail', kwargs={'pk': self.survey.pk})
+        self.multiple.condition_choices.add(self.yes)
+        with CaptureQueriesContext(connection) as before:
+            self.client.get(url)
+        extra = Question.objects.create(survey=self.survey, text='Extra', question_type='single', order=2)
+        Choice.objects.create(question=extra, text='A')
+        extra.condition_choices.add(self.no)
+        with CaptureQueriesContext(connection) as after:
+            response = self.client.get(url)
+        self.assertContains(response, 'Affichée si')
+        self.assertEqual(len(before), len(after))
+
+
+class ParticipationFragmentCacheTests(SurveyResultsTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.url = reverse('surveys:participate', kwargs={'pk': self.survey.pk})
+        self.client.login(username='testuser', password='testpass123')
+
+    def test_questions_rendered_once_per_revision(self):
+        with mock.patch('survey.views.build_answer_forms', wraps=build_answer_forms) as build:
+            first = self.client.get(self.url)
+            second = self.client.get(self.url)
+            self.assertEqual(build.call_count, 1)
+            self.assertContains(second, 'Rouge')
+            self.assertNotEqual(first.context['csrf_token'], '')
+
+            # Modifier un choix change la révision du sondage
+            self.red.text = 'Pourpre'
+            self.red.save()
+            response = self.client.get(self.url)
+            self.assertEqual(build.call_count, 2)
+            self.assertContains(response, 'Pourpre')
+
+    def test_errors_not_cached(self):
+        self.client.get(self.url)
+        response = self.client.post(self.url, {})
+        self.assertContains(response, 'invalid-feedback')
+        response = self.client.get(self.url)
+        self.assertNotContains(response, 'invalid-feedback')
+
+
+@mock.patch.object(SurveyParticipateView, 'questions_per_page', 1)
+class PagedParticipationTests(SurveyResultsTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.url = reverse('surveys:participate', kwargs={'pk': self.survey.pk})
+        self.client.login(username='testuser', password='testpass123')
+
+    def test_pages_and_final_submit(self):
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Single')
+        self.assertNotContains(response, 'Multiple')
+
+        # Une question obligatoire manquante bloque le passage à la page suivante
+        response = self.client.post(self.url, {'page': 1, 'action': 'next'})
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.post(self.url, {
+            'page': 1,
+            'action': 'next',
+            f'question_{self.single.id}-single_choice': self.no.id,
+        })
+        self.assertRedirects(response, self.url + '?page=2', fetch_redirect_response=False)
+        self.assertEqual(self.client.session[draft_key(self.survey, self.user)], {str(self.single.id): self.no.id})
+        self.assertFalse(Response.objects.exists())
+
+        # Les pages validées ne dépendent pas du cache
+        cache.clear()
+
+        response = self.client.post(self.url, {
+            'page': 2,
+            'action': 'submit',
+            f'question_{self.multiple.id}-selected_choices': [self.red.id],
+        })
+        self.assertRedirects(response, reverse('surveys:survey_results', kwargs={'pk': self.survey.pk}), fetch_redirect_response=False)
+        self.assertEqual(read_tallies(self.survey)[2], {self.no.id: 1, self.red.id: 1})
+        self.assertNotIn(draft_key(self.survey, self.user), self.client.session)
+
+    def test_final_submit_returns_to_incomplete_page(self):
+        response = self.client.post(self.url, {'page': 2, 'action': 'submit'})
+        self.assertEqual(response.context['page'], 1)
+        self.assertFalse(Response.objects.exists())
+
+    def test_autosave_does_not_write_to_database(self):
+        url = reverse('surveys:participate_draft', kwargs={'pk': self.survey.pk})
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url, {
+                'page': 2,
+                f'question_{self.multiple.id}-selected_choices': [self.red.id, self.blue.id, 9999],
+            })
+        self.assertEqual(response.json()['answers'], 1)
+        self.assertFalse(any(
+            query['sql'].startswith(('INSERT', 'UPDATE', 'DELETE')) for query in queries.captured_queries
+        ))
+        self.assertEqual(cache.get(draft_key(self.survey, self.user)), {str(self.multiple.id): [self.red.id, self.blue.id]})
+
+        # Le brouillon est transmis à la page pour pré-remplir les champs
+        response = self.client.get(self.url + '?page=2')
+        self.assertEqual(response.context['draft'], {str(self.multiple.id): [self.red.id, self.blue.id]})
+
+
+class AdmissionControlTests(SurveyResultsTestCase):
+    def test_limiter_queues_then_rejects(self):
+        limiter = AdmissionLimiter(max_concurrent=1, max_queue=1, queue_timeout=0.01)
+        self.assertTrue(limiter.acquire())
+        with self.assertLogs('survey.admission', 'WARNING'):
+            self.assertFalse(limiter.acquire())
+        self.assertEqual(limiter.stats()['rejected'], 1)
+        limiter.release()
+        self.assertTrue(limiter.acquire())
+        self.assertEqual(limiter.stats()['active'], 1)
+
+    def test_saturated_submissions_get_503(self):
+        limiter = AdmissionLimiter(max_concurrent=1, max_queue=0, queue_timeout=0.01)
+        limiter.acquire()
+        self.client.login(username='testuser', password='testpass123')
+        url = reverse('surveys:participate', kwargs={'pk': self.survey.pk})
+        with mock.patch('survey.admission.get_limiter', return_value=limiter), self.assertLogs('survey.admission', 'WARNING'):
+            response = self.client.post(url, {f'question_{self.single.id}-single_choice': self.yes.id})
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response['Retry-After'], '5')
+
+            response = self.client.post(
+                reverse('surveys:api_submissions', kwargs={'pk': self.survey.pk}),
+                data=json.dumps({'answers': {str(self.single.id): self.yes.id}}),
+                content_type='application/json'
+            )
+            self.assertEqual(response.status_code, 503)
+            self.assertIn('error', response.json())
+
+            # Les autres pages ne sont pas limitées
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.assertFalse(Response.objects.filter(survey=self.survey).exists())
+        self.assertEqual(limiter.stats()['rejected'], 2)
+
+
+class PublicParticipationTests(SurveyResultsTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.survey.anonymous = True
+        self.survey.save()
+        self.url = reverse('surveys:public_participate', kwargs={'pk': self.survey.pk})
+
+    def test_anonymous_participation(self):
+        response = self.client.post(self.url, {f'question_{self.single.id}-single_choice': self.yes.id})
+        self.assertRedirects(response, self.url, fetch_redirect_response=False)
+        saved = Response.objects.get(survey=self.survey)
+        self.assertIsNone(saved.respondent)
+        self.assertEqual(saved.participant_label, 'Anonyme')
+        self.assertEqual(read_tallies(self.survey)[2], {self.yes.id: 1})
+
+        # Le cookie signé empêche une seconde participation
+        response = self.client.post(self.url, {f'question_{self.single.id}-single_choice': self.no.id})
+        self.assertEqual(response.status_code, 409)
+        self.assertContains(self.client.get(self.url), 'déjà participé')
+        self.assertEqual(Response.objects.filter(survey=self.survey).count(), 1)
+
+    def test_no_session_or_user_queries(self):
+        self.client.login(username='testuser', password='testpass123')
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url)
+            self.client.post(self.url, {f'question_{self.single.id}-single_choice': self.yes.id})
+        sql = ' '.join(query['sql'] for query in queries)
+        self.assertNotIn('django_session', sql)
+        self.assertNotIn('auth_user', sql)
+        self.assertIsNone(Response.objects.get(survey=self.survey).respondent)
+
+    def test_only_anonymous_surveys(self):
+        self.survey.anonymous = False
+        self.survey.save()
+        self.assertEqual(self.client.get(self.url).status_code, 404)
+
+
+class AvailableSurveysCacheTests(SurveyResultsTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.url = reverse('surveys:available_surveys')
+
+    def available_titles(self):
+        return [survey.title for survey in self.client.get(self.url).context['surveys']]
+
+    def test_warm_cache_skips_database(self):
+        self.client.login(username='testuser', password='testpass123')
+        self.client.get(self.url)
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.context['total_available'], 1)
+        sql = ' '.join(query['sql'] for query in queries)
+        self.assertNotIn('survey_response', sql)
+        self.assertNotIn('survey_survey', sql)
+
+    def test_participation_updates_answered_set(self):
+        self.client.login(username='testuser', password='testpass123')
+        self.assertEqual(self.available_titles(), ['Tally Survey'])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.participate('testuser', {f'question_{self.single.id}-single_choice': self.yes.id})
+        self.assertEqual(self.available_titles(), [])
+        self.assertEqual(answered_survey_ids(self.user), {self.survey.pk})
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Response.objects.filter(respondent=self.user).delete()
+        self.assertEqual(self.available_titles(), ['Tally Survey'])
+
+    def test_survey_changes_invalidate_active_list(self):
+        self.client.login(username='testuser', password='testpass123')
+        self.assertEqual(self.available_titles(), ['Tally Survey'])
+        with self.captureOnCommitCallbacks(execute=True):
+            Survey.objects.create(
+                title='Nouveau',
+                start_date=timezone.now(),
+                end_date=timezone.now() + timedelta(days=1),
+                creator=self.creator,
+                status='published'
+            )
+            self.survey.status = 'draft'
+            self.survey.save()
+        self.assertEqual(self.available_titles(), ['Nouveau'])
+
+
+class SurveyExportTests(SurveyResultsTestCase):
+    def test_export_restricted_to_creator(self):
+        self.client.login(username='testuser', password='testpass123')
+        response = self.client.get(reverse('surveys:survey_export', kwargs={'pk': self.survey.pk}))
+        self.assertEqual(response.status_code, 403)
+
+    def test_export_csv_and_ndjson(self):
+        self.participate('testuser', {
+            f'question_{self.single.id}-single_choice': self.no.id,
+            f'question_{self.multiple.id}-selected_choices': [self.red.id, self.blue.id],
+        })
+        self.client.login(username='creator', password='testpass123')
+        url = reverse('surveys:survey_export', kwargs={'pk': self.survey.pk})
+
+        response = self.client.get(url)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        rows = list(csv.reader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(rows[0], ['id', 'participant', 'date', 'Single', 'Multiple'])
+        self.assertEqual(rows[1][1], 'testuser')
+        self.assertEqual(rows[1][3:], ['Non', 'Rouge; Bleu'])
+
+        response = self.client.get(url + '?format=ndjson')
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['answers'], {
+            str(self.single.id): ['Non'],
+            str(self.multiple.id): ['Rouge', 'Bleu'],
+        })
+
+
+class SurveySegmentTests(SurveyResultsTestCase):
+    def setUp(self):
+        super().setUp()
+        get_user_model().objects.create_user(username='other', password='testpass123')
+        self.participate('testuser', {
+            f'question_{self.single.id}-single_choice': self.yes.id,
+            f'question_{self.multiple.id}-selected_choices': [self.red.id, self.blue.id],
+        })
+        self.participate('other', {
+            f'question_{self.single.id}-single_choice': self.no.id,
+            f'question_{self.multiple.id}-selected_choices': [self.blue.id],
+        })
+        self.client.login(username='creator', password='testpass123')
+
+    def test_results_filtered_by_choice(self):
+        response = self.client.get(
+            reverse('surveys:survey_results', kwargs={'pk': self.survey.pk}) + f'?choice={self.yes.id}'
+        )
+        self.assertEqual(response.context['total_participants'], 1)
+        self.assertEqual(response.context['segment_choices'], [self.yes])
+        multiple_stats = response.context['questions_stats'][1]
+        self.assertEqual([stat['count'] for stat in multiple_stats['choices_stats']], [1, 1])
+
+    def test_crosstab(self):
+        response = self.client.get(
+            reverse('surveys:survey_crosstab', kwargs={'pk': self.survey.pk})
+            + f'?row={self.single.id}&column={self.multiple.id}'
+        )
+        table = response.context['crosstab']
+        self.assertEqual(table['columns'], [self.red, self.blue])
+        self.assertEqual([row['counts'] for row in table['rows']], [[1, 1], [0, 1]])
+        self.assertEqual(table['column_totals'], [1, 2])
+
+        response = self.client.get(
+            reverse('surveys:survey_crosstab', kwargs={'pk': self.survey.pk})
+            + f'?row={self.single.id}&column={self.multiple.id}&choice={self.no.id}'
+        )
+        self.assertEqual([row['counts'] for row in response.context['crosstab']['rows']], [[0, 0], [0, 1]])
+
+
+class SurveyTimeWindowTests(SurveyResultsTestCase):
+    def setUp(self):
+        super().setUp()
+        self.participate('testuser', {
+            f'question_{self.single.id}-single_choice': self.yes.id,
+            f'question_{self.multiple.id}-selected_choices': [self.red.id],
+        })
+        self.client.login(username='creator', password='testpass123')
+
+    def test_submission_updates_buckets(self):
+        hour = timezone.now().replace(minute=0, second=0, microsecond=0)
+        self.assertEqual(ParticipationBucket.objects.get(survey=self.survey).hour, hour)
+        self.assertEqual(ChoiceBucket.objects.get(choice=self.red).count, 1)
+
+        start, end = hour, hour + timedelta(hours=1)
+        self.assertEqual(
+            read_window_tallies(self.survey, start, end),
+            (1, {self.single.id: 1, self.multiple.id: 1}, {self.yes.id: 1, self.red.id: 1})
+        )
+        self.assertEqual(read_window_tallies(self.survey, end, end + timedelta(days=1))[0], 0)
+        self.assertEqual(participation_series(self.survey, 'hour'), [(hour, 1)])
+        self.assertEqual(participation_series(self.survey), [(timezone.localdate(), 1)])
+
+    def test_results_filtered_by_dates(self):
+        url = reverse('surveys:survey_results', kwargs={'pk': self.survey.pk})
+        today = timezone.localdate()
+
+        response = self.client.get(url + f'?since={today}&until={today}')
+        self.assertEqual(response.context['total_participants'], 1)
+        self.assertEqual(response.context['participation_series']['counts'], [1])
+
+        response = self.client.get(url + f'?since={today + timedelta(days=1)}')
+        self.assertEqual(response.context['total_participants'], 0)
+        self.assertEqual(response.context['participation_series']['counts'], [])
+
+    def test_rebuild_buckets(self):
+        ParticipationBucket.objects.filter(survey=self.survey).delete()
+
+        with self.assertRaises(CommandError):
+            call_command('rebuild_tallies', self.survey.pk, '--check', stdout=StringIO())
+
+        call_command('rebuild_tallies', self.survey.pk, stdout=StringIO())
+        self.assertEqual(ParticipationBucket.objects.get(survey=self.survey).count, 1)
+
+
+class SurveyResultsCacheTests(SurveyResultsTestCase):
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.url = reverse('surveys:survey_results', kwargs={'pk': self.survey.pk})
+
+    def test_results_cached_by_version(self):
+        with mock.patch('survey.views.survey_results', wraps=survey_results) as compute:
+            self.participate('testuser', {f'question_{self.single.id}-single_choice': self.yes.id})
+            self.client.login(username='creator', password='testpass123')
+            self.client.get(self.url)
+            response = self.client.get(self.url)
+            self.assertEqual(compute.call_count, 1)
+            self.assertEqual(response.context['total_participants'], 1)
+
+            # Les filtres ont leur propre entrée de cache
+            self.client.get(self.url + f'?choice={self.yes.id}')
+            self.assertEqual(compute.call_count, 2)
+
+            # Modifier un choix change la version des résultats
+            self.no.text = 'Non merci'
+            self.no.save()
+            response = self.client.get(self.url)
+            self.assertEqual(compute.call_count, 3)
+            self.assertEqual(response.context['questions_stats'][0]['choices_stats'][1]['choice'].text, 'Non merci')
+
+    def test_conditional_get(self):
+        self.client.login(username='creator', password='testpass123')
+        response = self.client.get(self.url)
+        etag = response.headers['ETag']
+        self.assertIn('Last-Modified', response.headers)
+
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        # Un autre filtre ou une nouvelle participation donne une autre page
+        response = self.client.get(self.url + f'?choice={self.yes.id}', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.participate('testuser', {f'question_{self.single.id}-single_choice': self.yes.id})
+        self.client.login(username='creator', password='testpass123')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response.headers['ETag'], etag)
+
+
+class SurveyLiveResultsTests(SurveyResultsTestCase):
+    async def test_feed_broadcasts_deltas(self):
+        feed = SurveyFeed('test', self.survey)
+        queue = asyncio.Queue()
+        feed.subscribers.add(queue)
+        await feed.refresh()
+        self.assertTrue(queue.empty())
+
+        await sync_to_async(self.participate)('testuser', {
+            f'question_{self.single.id}-single_choice': self.yes.id,
+            f'question_{self.multiple.id}-selected_choices': [self.blue.id],
+        })
+        await feed.refresh()
+        event, data = queue.get_nowait().split('\n', 1)
+        self.assertEqual(event, 'event: delta')
+        delta = json.loads(data.removeprefix('data: '))
+        self.assertEqual(delta['participants_delta'], 1)
+        self.assertEqual(delta['choices'], {str(self.yes.id): 1, str(self.blue.id): 1})
+
+        # Sans nouvelle version, rien n'est relu ni diffusé
+        await feed.refresh()
+        self.assertTrue(queue.empty())
+
+    async def test_events_start_with_snapshot(self):
+        events = live_events(self.survey)
+        try:
+            first = await anext(events)
+        finally:
+            await events.aclose()
+        self.assertIn('event: snapshot', first)
+        self.assertEqual(json.loads(first.split('data: ', 1)[1])['participants'], 0)
+
+    async def test_live_view_access(self):
+        url = reverse('surveys:survey_live_results', kwargs={'pk': self.survey.pk})
+        await self.async_client.aforce_login(self.user)
+        response = await self.async_client.get(url)
+        self.assertEqual(response.status_code, 403)
+
+        await self.async_client.aforce_login(self.creator)
+        response = await self.async_client.get(url)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        results = await self.async_client.get(reverse('surveys:survey_results', kwargs={'pk': self.survey.pk}))
+        self.assertContains(results, 'EventSource')
+
+    def test_live_results_need_asgi(self):
+        # Sous WSGI, ni flux infini ni script EventSource
+        self.client.force_login(self.creator)
+        url = reverse('surveys:survey_live_results', kwargs={'pk': self.survey.pk})
+        self.assertEqual(self.client.get(url).status_code, 204)
+        results = self.client.get(reverse('surveys:survey_results', kwargs={'pk': self.survey.pk}))
+        self.assertNotContains(results, 'EventSource')
+
+
+class SurveyTextAnswersTestCase(TestCase):
+    """Sondage publié à une question texte et trois réponses."""
+
+    def setUp(self):
+        self.client = Client()
+        self.user = get_user_model().objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.survey = Survey.objects.create(
+            title='Text Survey',
+            description='Test Description',
+            start_date=timezone.now(),
+            end_date=timezone.now() + timedelta(days=7),
+            creator=self.user,
+            status='published'
+        )
+        self.question = Question.objects.create(survey=self.survey, text='Avis', question_type='text')
+        texts = ["La cantine de l'école est bonne", "Trop de devoirs", "École trop loin, école fermée tôt"]
+        self.answers = []
+        for i, text in enumerate(texts):
+            response = Response.objects.create(
+                survey=self.survey,
+                respondent=get_user_model().objects.create_user(username=f'r{i}')
+            )
+            self.answers.append(Answer.objects.create(response=response, question=self.question, text_answer=text))
+
+
+class SurveyTextSearchTests(SurveyTextAnswersTestCase):
+    def test_search_is_ranked_and_ignores_accents(self):
+        answers, has_next = search_text_answers(self.survey, 'ecole')
+        self.assertEqual(answers, [self.answers[2], self.answers[0]])
+        self.assertFalse(has_next)
+
+        answers, has_next = search_text_answers(self.survey, 'ecole', limit=1)
+        self.assertEqual(len(answers), 1)
+        self.assertTrue(has_next)
+
+    def test_index_follows_updates_and_deletes(self):
+        self.answers[1].text_answer = "Pas assez de sport à l'école"
+        self.answers[1].save()
+        self.answers[0].delete()
+        answers, _ = search_text_answers(self.survey, 'école')
+        self.assertEqual(sorted(answer.pk for answer in answers), [self.answers[1].pk, self.answers[2].pk])
+
+    def test_icontains_fallback(self):
+        with mock.patch('survey.search.fts_available', return_value=False):
+            answers, _ = search_text_answers(self.survey, 'trop devoirs')
+        self.assertEqual(answers, [self.answers[1]])
+
+    def test_search_view(self):
+        self.client.login(username='testuser', password='testpass123')
+        response = self.client.get(
+            reverse('surveys:survey_text_search', kwargs={'pk': self.survey.pk}) + '?q=cantine'
+        )
+        self.assertContains(response, "La cantine de l&#x27;école est bonne")
+        self.assertNotContains(response, 'Trop de devoirs')
+
+
+class SurveyTextAnswersPaginationTests(SurveyTextAnswersTestCase):
+    def test_first_page_per_question(self):
+        other = Question.objects.create(survey=self.survey, text='Autre', question_type='text', order=1)
+        Answer.objects.create(response=self.answers[0].response, question=other, text_answer='Rien')
+        Answer.objects.create(response=self.answers[1].response, question=other, text_answer='')
+
+        pages = collect_text_answers(self.survey, limit=2)
+        self.assertEqual(pages[self.question.id], (
+            ["La cantine de l'école est bonne", 'Trop de devoirs'],
+            self.answers[1].id
+        ))
+        self.assertEqual(pages[other.id], (['Rien'], None))
+
+    def test_keyset_pages(self):
+        page, next_cursor = text_answers_page(self.question, limit=2)
+        self.assertEqual([answer_id for answer_id, _ in page], [self.answers[0].id, self.answers[1].id])
+        page, next_cursor = text_answers_page(self.question, after=next_cursor, limit=2)
+        self.assertEqual(page, [(self.answers[2].id, self.answers[2].text_answer)])
+        self.assertIsNone(next_cursor)
+
+    def test_json_endpoint(self):
+        self.client.login(username='testuser', password='testpass123')
+        response = self.client.get(
+            reverse('surveys:survey_text_answers', kwargs={'pk': self.survey.pk, 'question_pk': self.question.pk})
+            + f'?after={self.answers[0].id}'
+        )
+        self.assertEqual(response.json(), {
+            'answers': [
+                {'id': self.answers[1].id, 'text': 'Trop de devoirs'},
+                {'id': self.answers[2].id, 'text': 'École trop loin, école fermée tôt'},
+            ],
+            'next': None,
+        })
+
+
+class TermSummaryTests(TestCase):
+    def setUp(self):
+        self.client = Client()
+        self.user = get_user_model().objects.create_user(
+            username='testuser',
+            password='testpass123'
+        )
+        self.survey = Survey.objects.create(
+            title='Term Survey',
+            description='Test Description',
+            start_date=timezone.now(),
+            end_date=timezone.now() + timedelta(days=7),
+            creator=self.user,
+            status='published'
+        )
+        self.question = Question.objects.create(survey=self.survey, text='Avis', question_type='text')
+
+    def participate(self, username, text):
+        get_user_model().objects.create_user(username=username, password='testpass123')
+        self.client.login(username=username, password='testpass123')
+        self.client.post(
+            reverse('surveys:participate', kwargs={'pk': self.survey.pk}),
+            {f'question_{self.question.id}-text_answer': text}
+        )
+
+    def test_extract_terms(self):
+        self.assertEqual(
+            extract_terms("La cantine de l'école, the school's food"),
+            ['cantine', 'école', 'cantine école', 'school', 'food', 'school food']
+        )
+
+    def test_terms_counted_at_submission(self):
+        self.participate('a', 'Cantine trop chère, cantine bruyante')
+        self.participate('b', 'La cantine est trop bruyante')
+        top_terms = read_top_terms(self.survey, limit=3)
+        self.assertEqual(top_terms[self.question.id], [('bruyante', 2), ('cantine', 2), ('cantine trop', 2)])
+
+        self.client.login(username='testuser', password='testpass123')
+        response = self.client.get(reverse('surveys:survey_results', kwargs={'pk': self.survey.pk}))
+        self.assertEqual(response.context['questions_stats'][0]['top_terms'][0], ('bruyante', 2))
+
+    def test_rebuild_recounts_terms(self):
+        self.participate('a', 'Cantine trop chère')
+        TermCount.objects.filter(term='cantine').update(count=7)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_tallies', self.survey.pk, '--check', stdout=StringIO())
+        call_command('rebuild_tallies', self.survey.pk, stdout=StringIO())
+        self.assertEqual(TermCount.objects.get(term='cantine').count, 1)
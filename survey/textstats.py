@@ -0,0 +1,61 @@
+"""Extraction des termes (mots et bigrammes) des réponses texte.
+
+Les termes servent aux résumés « mots-clés » des questions ouvertes : ils
+sont comptés une fois par réponse, en ignorant les mots vides français et
+anglais.
+"""
+import re
+
+# Nombre maximal de termes distincts retenus par réponse
+MAX_TERMS_PER_ANSWER = 100
+
+TERM_MAX_LENGTH = 100
+
+STOPWORDS = frozenset("""
+    a à ai aie aient aies ait alors as au aucun aussi autre aux avec avoir avons
+    bon c ça car ce ceci cela celle celles celui ces cet cette ceux chaque ci comme
+    comment d dans de des du donc dont elle elles en encore entre es est et étaient
+    était étant été être eu eux fait faire fais font hors ici il ils j je jusqu l la
+    le les leur leurs lui m ma mais me même mes moi mon n ne ni nos notre nous on
+    ont ou où par parce pas peu peut plus pour pourquoi qu quand que quel quelle
+    quelles quels qui s sa sans se sera ses si sien son sont sous sur t ta te tes
+    toi ton tous tout toute toutes très tu un une unes uns vos votre vous vu y
+    about above after again against all am an and any are as at be because been
+    before being below between both but by can could did do does doing down during
+    each few for from further had has have having he her here hers herself him
+    himself his how i if in into is it its itself just me more most my myself no
+    nor not now of off on once only or other our ours ourselves out over own same
+    she should so some such than that the their theirs them themselves then there
+    these they this those through to too under until up very was we were what when
+    where which while who whom why will with would you your yours yourself
+""".split())
+
+_word_re = re.compile(r"[^\W\d_]+(?:['’-][^\W\d_]+)*")
+_clause_re = re.compile(r"[.,;:!?()\[\]\n]+")
+
+# Élisions françaises : « l'école » donne « école », mais « school's » donne « school »
+ELISIONS = frozenset(['c', 'd', 'j', 'l', 'm', 'n', 's', 't', 'qu', 'jusqu', 'lorsqu', 'puisqu', 'quoiqu'])
+
+
+def tokenize(text):
+    """Découpe un texte en mots en minuscules, sans les mots vides."""
+    words = []
+    for word in _word_re.findall((text or '').lower()):
+        head, _, tail = word.replace('’', "'").partition("'")
+        word = tail if head in ELISIONS and tail else head
+        if len(word) > 1 and word not in STOPWORDS:
+            words.append(word)
+    return words
+
+
+def extract_terms(text):
+    """Retourne les termes distincts d'une réponse : mots et bigrammes de mots consécutifs.
+
+    Les bigrammes ne franchissent pas la ponctuation.
+    """
+    terms = {}
+    for clause in _clause_re.split(text or ''):
+        words = tokenize(clause)
+        terms.update(dict.fromkeys(words))
+        terms.update(dict.fromkeys(f'{first} {second}' for first, second in zip(words, words[1:])))
+    return [term for term in terms if len(term) <= TERM_MAX_LENGTH][:MAX_TERMS_PER_ANSWER]
@@ -12,10 +12,22 @@ urlpatterns = [
     path('<int:pk>/delete/', views.SurveyDeleteView.as_view(), name='survey_delete'),
     path('<int:pk>/edit/questions/', views.SurveyEditQuestionsView.as_view(), name='survey_edit_questions'),
     path('question/<int:pk>/choices/', views.QuestionChoicesView.as_view(), name='question_choices'),
+    path('question/<int:pk>/conditions/', views.QuestionConditionsView.as_view(), name='question_conditions'),
     path('<int:pk>/publish/', views.SurveyPublishView.as_view(), name='survey_publish'),
     
     # Participation aux sondages
     path('available/', views.AvailableSurveyListView.as_view(), name='available_surveys'),
     path('<int:pk>/participate/', views.SurveyParticipateView.as_view(), name='participate'),
+    path('<int:pk>/public/', views.SurveyPublicParticipateView.as_view(), name='public_participate'),
+    path('<int:pk>/participate/draft/', views.SurveyParticipationDraftView.as_view(), name='participate_draft'),
+    path('<int:pk>/api/submissions/', views.SurveySubmissionsApiView.as_view(), name='api_submissions'),
     path('<int:pk>/results/', views.SurveyResultsView.as_view(), name='survey_results'),
+    path('<int:pk>/results/live/', views.SurveyLiveResultsView.as_view(), name='survey_live_results'),
+    path('<int:pk>/results/crosstab/', views.SurveyCrosstabView.as_view(), name='survey_crosstab'),
+    path('<int:pk>/results/questions/<int:question_pk>/answers/', views.SurveyTextAnswersView.as_view(), name='survey_text_answers'),
+    path('<int:pk>/results/search/', views.SurveyTextSearchView.as_view(), name='survey_text_search'),
+    path('<int:pk>/results/export/', views.SurveyExportView.as_view(), name='survey_export'),
+    
+    # Supervision
+    path('status/admission/', views.AdmissionStatusView.as_view(), name='admission_status'),
 ]
\ No newline at end of file
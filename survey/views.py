@@ -2,38 +2,127 @@ from django import forms
 from django.views.generic import ListView, DetailView, CreateView, UpdateView, DeleteView, View
 from django.views.generic.detail import SingleObjectMixin
 from django.contrib.auth.mixins import LoginRequiredMixin, UserPassesTestMixin
-from django.shortcuts import render, redirect, get_object_or_404
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.auth.views import redirect_to_login
+from django.shortcuts import render, redirect, get_object_or_404, aget_object_or_404
 from django.urls import reverse_lazy, reverse
-from django.http import HttpResponseRedirect, JsonResponse
-from django.db import transaction
+from django.core.handlers.asgi import ASGIRequest
+from django.http import HttpResponse, HttpResponseRedirect, JsonResponse, StreamingHttpResponse
+from django.db import IntegrityError, transaction
 from django.contrib import messages
 from django.forms import formset_factory
-from django.core.exceptions import ValidationError
+from django.core.exceptions import PermissionDenied, ValidationError
+from django.core.cache import cache
 from django.utils import timezone
-from .models import Survey, Question, Choice, Response, Answer
-from django.db.models import Q
-from .forms import SurveyForm, QuestionForm, QuestionFormSet, ChoiceFormSet, SurveyPublishForm, AnswerForm, SurveySearchForm
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.dateparse import parse_date
+from django.utils.http import http_date, quote_etag, urlencode
+from hashlib import md5
+import json
+from datetime import datetime, time, timedelta
+from .models import Survey, Question, Choice, Response
+from django.db.models import Count, Exists, OuterRef
+from .forms import (
+    SurveyForm, QuestionForm, QuestionFormSet, ChoiceFormSet, QuestionConditionsForm, SurveyPublishForm,
+    SurveySearchForm
+)
+from .admission import get_limiter
+from .availability import available_surveys
+from .counters import aggregate_status_counts, read_status_counts
+from .drafts import autosave_draft, delete_draft, extract_draft_values, load_draft, save_draft
+from .export import EXPORT_FORMATS, stream_export
+from .live import live_events
+from .results import (
+    RESULTS_CACHE_TIMEOUT, crosstab, restrict_to_window, results_cache_key, segment_responses,
+    survey_results, text_answers_page
+)
+from .pagination import keyset_list_page, keyset_page, ranked_page
+from .schema import condition_errors, get_schema
+from .search import search_surveys, search_text_answers
+from .services import (
+    answers_data, build_answer_forms, clean_answers, clean_json_answers, new_respondent_token, save_submissions
+)
+from .tallies import participation_series, read_results_version
+from .writer import submit_answers, write_batch
 
 
 
-class SurveyListView(LoginRequiredMixin, ListView):
+class SurveyObjectMixin:
+    """Charge le sondage une seule fois par requête, avec son créateur et la participation de l'utilisateur
+    
+    Le sondage mémorisé est réutilisé par les contrôles d'accès, le contexte et
+    le traitement du POST ; `survey.user_has_participated` évite une requête
+    supplémentaire pour savoir si l'utilisateur a déjà répondu.
+    """
+
+    def get_queryset(self):
+        queryset = super().get_queryset().select_related('creator')
+        user = self.request.user
+        if user.is_authenticated:
+            queryset = queryset.annotate(user_has_participated=Exists(
+                Response.objects.filter(survey=OuterRef('pk'), respondent=user)
+            ))
+        return queryset
+
+    def get_object(self, queryset=None):
+        if queryset is not None:
+            return super().get_object(queryset)
+        if not hasattr(self, '_survey'):
+            self._survey = super().get_object()
+        return self._survey
+
+
+def start_of_day(day):
+    """Début du jour `day` dans le fuseau courant, en datetime avec fuseau"""
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+class KeysetPaginationMixin:
+    """Pagination par curseur (voir survey.pagination) : `?cursor=` désigne la page affichée"""
+    per_page = 10
+    ranked = False
+
+    def cursor_url(self, cursor):
+        if cursor is None:
+            return None
+        params = self.request.GET.copy()
+        params['cursor'] = cursor
+        return '?' + params.urlencode()
+
+    def paginate(self, object_list, cursor):
+        paginate = ranked_page if self.ranked else keyset_page
+        return paginate(object_list, cursor, self.per_page)
+
+    def get_context_data(self, **kwargs):
+        page = self.paginate(self.object_list, self.request.GET.get('cursor'))
+        context = super().get_context_data(object_list=page.object_list, **kwargs)
+        context.update({
+            'page': page,
+            'is_paginated': page.has_next or page.has_previous,
+            'next_url': self.cursor_url(page.next_cursor),
+            'previous_url': self.cursor_url(page.previous_cursor),
+        })
+        return context
+
+
+class SurveyListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     model = Survey
     template_name = 'survey/survey_list.html'
     context_object_name = 'surveys'
-    paginate_by = 10
 
     def get_queryset(self):
         queryset = Survey.objects.all()
-        form = SurveySearchForm(self.request.GET)
+        # Formulaire validé une seule fois, réutilisé par le contexte
+        form = self.search_form = SurveySearchForm(self.request.GET)
+        self.is_filtered = False
+        ranked = False
 
         if form.is_valid():
-            # Recherche par mot-clé dans le titre ou la description
+            self.is_filtered = any(form.cleaned_data.values())
+            # Recherche par mot-clé dans le titre ou la description (index plein texte)
             search = form.cleaned_data.get('search')
             if search:
-                queryset = queryset.filter(
-                    Q(title__icontains=search) |
-                    Q(description__icontains=search)
-                )
+                queryset, ranked = search_surveys(queryset, search)
 
             # Filtrage par créateur
             creator = form.cleaned_data.get('creator')
@@ -42,38 +131,57 @@ class SurveyListView(LoginRequiredMixin, ListView):
                     creator__username__icontains=creator
                 )
 
-            # Filtrage par date
+            # Filtrage par date : intervalles semi-ouverts dans le fuseau de l'utilisateur,
+            # comparés directement à la colonne (et à son index)
             date_from = form.cleaned_data.get('date_from')
             if date_from:
-                queryset = queryset.filter(created_at__date__gte=date_from)
+                queryset = queryset.filter(created_at__gte=start_of_day(date_from))
 
             date_to = form.cleaned_data.get('date_to')
             if date_to:
-                queryset = queryset.filter(created_at__date__lte=date_to)
+                queryset = queryset.filter(created_at__lt=start_of_day(date_to + timedelta(days=1)))
 
             # Filtrage par statut
             status = form.cleaned_data.get('status')
             if status:
                 queryset = queryset.filter(status=status)
 
-        return queryset.order_by('-created_at')
+        # Les résultats d'une recherche sont classés par pertinence
+        self.ranked = ranked
+        if ranked:
+            return queryset.order_by('search_rank', '-created_at', '-id')
+        return queryset.order_by('-created_at', '-id')
+
+    def get_status_counts(self):
+        """Total et nombre par statut : compteurs en cache sans filtre, sinon un seul agrégat"""
+        if not hasattr(self, '_status_counts'):
+            if self.is_filtered:
+                self._status_counts = aggregate_status_counts(self.object_list)
+            else:
+                self._status_counts = read_status_counts()
+        return self._status_counts
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['search_form'] = SurveySearchForm(self.request.GET)
+        context['search_form'] = self.search_form
         
-        # Ajouter des statistiques de base
-        context['total_surveys'] = self.get_queryset().count()
-        context['published_surveys'] = self.get_queryset().filter(status='published').count()
-        context['draft_surveys'] = self.get_queryset().filter(status='draft').count()
+        # Statistiques de base
+        counts = self.get_status_counts()
+        context['total_surveys'] = counts['total']
+        context['published_surveys'] = counts['published']
+        context['draft_surveys'] = counts['draft']
         
         return context
 
 
-class SurveyDetailView(LoginRequiredMixin, DetailView):
+class SurveyDetailView(LoginRequiredMixin, SurveyObjectMixin, DetailView):
     model = Survey
     template_name = 'survey/survey_detail.html'
     
+    def get_queryset(self):
+        # Questions, choix et conditions d'affichage chargés en trois requêtes, quel que soit leur nombre
+        return super().get_queryset().prefetch_related('questions__choices', 'questions__condition_choices')
+    
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['is_creator'] = self.object.creator == self.request.user
@@ -83,7 +191,7 @@ class SurveyDetailView(LoginRequiredMixin, DetailView):
 class SurveyCreateView(LoginRequiredMixin, CreateView):
     model = Survey
     template_name = 'survey/survey_form.html'
-    fields = ['title', 'description', 'start_date', 'end_date']
+    fields = ['title', 'description', 'start_date', 'end_date', 'anonymous']
 
     def form_valid(self, form):
         form.instance.creator = self.request.user
@@ -91,10 +199,10 @@ class SurveyCreateView(LoginRequiredMixin, CreateView):
         return super().form_valid(form)
 
 
-class SurveyUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
+class SurveyUpdateView(LoginRequiredMixin, SurveyObjectMixin, UserPassesTestMixin, UpdateView):
     model = Survey
     template_name = 'survey/survey_form.html'
-    fields = ['title', 'description', 'start_date', 'end_date']
+    fields = ['title', 'description', 'start_date', 'end_date', 'anonymous']
 
     def test_func(self):
         survey = self.get_object()
@@ -121,7 +229,7 @@ class SurveyUpdateView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
         return super().form_valid(form)
 
 
-class SurveyDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
+class SurveyDeleteView(LoginRequiredMixin, SurveyObjectMixin, UserPassesTestMixin, DeleteView):
     model = Survey
     template_name = 'survey/survey_confirm_delete.html'
     success_url = reverse_lazy('surveys:survey_list')
@@ -139,7 +247,7 @@ class SurveyDeleteView(LoginRequiredMixin, UserPassesTestMixin, DeleteView):
         return True
 
 
-class SurveyEditQuestionsView(LoginRequiredMixin, UserPassesTestMixin, SingleObjectMixin, View):
+class SurveyEditQuestionsView(LoginRequiredMixin, SurveyObjectMixin, UserPassesTestMixin, SingleObjectMixin, View):
     model = Survey
     template_name = 'survey/survey_edit_questions.html'
     
@@ -198,7 +306,13 @@ class QuestionChoicesView(LoginRequiredMixin, UserPassesTestMixin, View):
     template_name = 'survey/question_choices.html'
     
     def get_question(self):
-        return get_object_or_404(Question, pk=self.kwargs['pk'])
+        # Question chargée une fois par requête, avec son sondage et le créateur
+        if not hasattr(self, '_question'):
+            self._question = get_object_or_404(
+                Question.objects.select_related('survey__creator'),
+                pk=self.kwargs['pk']
+            )
+        return self._question
     
     def test_func(self):
         question = self.get_question()
@@ -254,7 +368,35 @@ class QuestionChoicesView(LoginRequiredMixin, UserPassesTestMixin, View):
         })
 
 
-class SurveyPublishView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
+class QuestionConditionsView(QuestionChoicesView):
+    """Conditions d'affichage d'une question (questions à choix ou texte)"""
+    template_name = 'survey/question_conditions.html'
+    
+    def test_func(self):
+        question = self.get_question()
+        return question.survey.creator == self.request.user and question.survey.can_be_edited()
+    
+    def get(self, request, *args, **kwargs):
+        question = self.get_question()
+        return render(request, self.template_name, {
+            'question': question,
+            'form': QuestionConditionsForm(instance=question),
+        })
+    
+    def post(self, request, *args, **kwargs):
+        question = self.get_question()
+        form = QuestionConditionsForm(request.POST, instance=question)
+        if form.is_valid():
+            form.save()
+            messages.success(request, "Les conditions d'affichage ont été sauvegardées.")
+            return redirect('surveys:survey_detail', pk=question.survey.pk)
+        return render(request, self.template_name, {
+            'question': question,
+            'form': form,
+        })
+
+
+class SurveyPublishView(LoginRequiredMixin, SurveyObjectMixin, UserPassesTestMixin, UpdateView):
     model = Survey
     template_name = 'survey/survey_publish.html'
     fields = []  # Pas de champs à éditer
@@ -277,154 +419,303 @@ class SurveyPublishView(LoginRequiredMixin, UserPassesTestMixin, UpdateView):
 
     def form_valid(self, form):
         survey = form.instance
+        # Questions et nombre d'options chargés en une requête
+        questions = list(survey.questions.annotate(choice_count=Count('choices')))
+        
         # Vérifier qu'il y a au moins une question
-        if not survey.questions.exists():
+        if not questions:
             messages.error(self.request, "Le sondage doit contenir au moins une question.")
             return self.form_invalid(form)
         
         # Vérifier que chaque question a des options si nécessaire
-        for question in survey.questions.all():
+        for question in questions:
             if question.question_type in ['single', 'multiple']:
-                if not question.choices.exists():
+                if not question.choice_count:
                     messages.error(self.request, f"La question '{question.text}' doit avoir au moins une option.")
                     return self.form_invalid(form)
         
+        # Vérifier que chaque condition d'affichage porte sur une question précédente
+        errors = condition_errors(survey)
+        if errors:
+            for error in errors:
+                messages.error(self.request, error)
+            return self.form_invalid(form)
+        
         survey.status = 'published'
         messages.success(self.request, "Le sondage a été publié avec succès!")
-        return super().form_valid(form)
+        response = super().form_valid(form)
+        # Compiler le schéma et ses conditions dès la publication
+        get_schema(survey)
+        return response
 
-class AvailableSurveyListView(LoginRequiredMixin, ListView):
+class AvailableSurveyListView(LoginRequiredMixin, KeysetPaginationMixin, ListView):
     model = Survey
     template_name = 'survey/available_surveys.html'
     context_object_name = 'surveys'
 
     def get_queryset(self):
-        now = timezone.now()
-        user = self.request.user
-        # Retourne les sondages publiés, actifs, auxquels l'utilisateur n'a pas encore participé
-        return Survey.objects.filter(
-            status='published',
-            start_date__lte=now,
-            end_date__gte=now
-        ).exclude(
-            responses__respondent=user
-        ).order_by('-created_at')
+        # Sondages publiés, actifs, auxquels l'utilisateur n'a pas encore participé :
+        # liste partagée en cache moins les participations de l'utilisateur (voir survey.availability)
+        return available_surveys(self.request.user)
+
+    def paginate(self, object_list, cursor):
+        return keyset_list_page(object_list, cursor, self.per_page)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         context['now'] = timezone.now()
+        context['total_available'] = len(self.object_list)
         return context
 
 
-class SurveyParticipateView(LoginRequiredMixin, UserPassesTestMixin, DetailView):
+class SurveyParticipateView(LoginRequiredMixin, SurveyObjectMixin, UserPassesTestMixin, DetailView):
     model = Survey
     template_name = 'survey/participate.html'
     context_object_name = 'survey'
+    # Nombre de questions affichées par page
+    questions_per_page = 10
+    # Durée de conservation du fragment des questions, mis en cache par révision du sondage
+    participation_cache_timeout = 60 * 60 * 24
 
-    def test_func(self):
-        survey = self.get_object()
+    def get_participation_error(self, survey):
+        """Raison pour laquelle l'utilisateur ne peut pas participer, ou None"""
         now = timezone.now()
         
         # Vérifier si le sondage est publié
         if survey.status != 'published':
-            messages.error(self.request, "Ce sondage n'est pas encore publié.")
-            return False
+            return "Ce sondage n'est pas encore publié."
             
         # Vérifier les dates
         if now < survey.start_date:
-            messages.error(self.request, "Ce sondage n'a pas encore commencé.")
-            return False
+            return "Ce sondage n'a pas encore commencé."
         if now > survey.end_date:
-            messages.error(self.request, "Ce sondage est terminé.")
-            return False
+            return "Ce sondage est terminé."
             
         # Vérifier si l'utilisateur n'a pas déjà répondu
-        if Response.objects.filter(survey=survey, respondent=self.request.user).exists():
-            messages.error(self.request, "Vous avez déjà participé à ce sondage.")
-            return False
+        if survey.user_has_participated:
+            return "Vous avez déjà participé à ce sondage."
             
+        return None
+
+    def test_func(self):
+        error = self.get_participation_error(self.get_object())
+        if error:
+            messages.error(self.request, error)
+            return False
         return True
 
+    def get_pages(self, schema):
+        """Questions du schéma découpées en pages"""
+        questions = schema.questions
+        return [
+            questions[i:i + self.questions_per_page]
+            for i in range(0, len(questions), self.questions_per_page)
+        ] or [()]
+
+    def get_page_number(self, value, pages):
+        page = int(value) if value.isdigit() else 1
+        return min(max(page, 1), len(pages))
+
+    def get_page_url(self, page):
+        return reverse('surveys:participate', kwargs={'pk': self.object.pk}) + f'?page={page}'
+
+    def find_page(self, pages, page, step, visible):
+        """Page suivante (`step` = 1) ou précédente (-1) contenant une question visible, ou None"""
+        number = page + step
+        while 1 <= number <= len(pages):
+            if any(question.id in visible for question in pages[number - 1]):
+                return number
+            number += step
+        return None
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         survey = self.get_object()
+        schema = get_schema(survey)
+        pages = self.get_pages(schema)
+        page = kwargs.get('page') or self.get_page_number(self.request.GET.get('page', '1'), pages)
+        context['branching'] = schema.branching()
+        context.update({
+            'page': page,
+            'page_count': len(pages),
+            'has_previous': page > 1,
+            'has_next': page < len(pages),
+        })
         
-        # Créer un formulaire pour chaque question
-        question_forms = []
-        for question in survey.questions.all().order_by('order'):
-            form = AnswerForm(question=question, prefix=f'question_{question.id}')
-            question_forms.append((question, form))
-        
-        context['question_forms'] = question_forms
+        # Formulaires liés aux données POST : affichés avec leurs erreurs, sans cache
+        context['form_errors'] = 'question_forms' in context
+        context['participation_cache_timeout'] = self.participation_cache_timeout
+        if not context['form_errors']:
+            # Formulaires vierges construits seulement si le fragment n'est pas déjà en cache :
+            # le gabarit appelle la fonction au premier accès. Le brouillon est
+            # appliqué aux champs par le navigateur.
+            context['question_forms'] = lambda: build_answer_forms(pages[page - 1])
+            context['draft'] = load_draft(self.request, survey)
         return context
 
+    def render_page(self, page, question_forms, error):
+        messages.error(self.request, error)
+        context = self.get_context_data(object=self.object, question_forms=question_forms, page=page)
+        return render(self.request, self.template_name, context)
+
     def post(self, request, *args, **kwargs):
         survey = self.get_object()
+        self.object = survey
         
         # Vérifier à nouveau les conditions
         if not self.test_func():
             return redirect('surveys:survey_list')
 
-        # Créer les formulaires avec les données POST
-        question_forms = []
-        has_errors = False
+        schema = get_schema(survey)
+        pages = self.get_pages(schema)
+        page = self.get_page_number(request.POST.get('page', '1'), pages)
+        action = request.POST.get('action', 'submit')
         
-        for question in survey.questions.all().order_by('order'):
-            form = AnswerForm(
-                question=question,
-                data=request.POST,
-                prefix=f'question_{question.id}'
-            )
-            if question.required and not form.is_valid():
-                has_errors = True
-            question_forms.append((question, form))
+        # Les réponses de la page rejoignent le brouillon de la session, même incomplètes
+        draft = save_draft(request, survey, extract_draft_values(pages[page - 1], request.POST))
+        # Questions visibles selon les conditions d'affichage, évaluées sur le schéma compilé
+        visible = schema.visible_question_ids(draft)
+        if action == 'previous':
+            return redirect(self.get_page_url(self.find_page(pages, page, -1, visible) or 1))
+        
+        question_forms = build_answer_forms(pages[page - 1], data=request.POST)
+        if clean_answers(question_forms, visible) is None:
+            return self.render_page(page, question_forms, "Veuillez corriger les erreurs ci-dessous.")
+        next_page = self.find_page(pages, page, 1, visible)
+        if action == 'next' and next_page:
+            return redirect(self.get_page_url(next_page))
 
-        if has_errors:
-            context = self.get_context_data(object=survey)
-            context['question_forms'] = question_forms
-            messages.error(request, "Veuillez corriger les erreurs ci-dessous.")
-            return render(request, self.template_name, context)
+        # Soumission finale : toutes les réponses du brouillon, validées avant d'ouvrir la transaction
+        question_forms = build_answer_forms(schema.questions, data=answers_data(schema.questions, draft))
+        answers = clean_answers(question_forms, visible)
+        if answers is None:
+            # Afficher la première page qui contient une erreur
+            for number, questions in enumerate(pages, 1):
+                page_forms = [(question, form) for question, form in question_forms if question in questions]
+                if clean_answers(page_forms, visible) is None:
+                    return self.render_page(number, page_forms, "Veuillez corriger les erreurs ci-dessous.")
 
         try:
-            with transaction.atomic():
-                # Créer la réponse
-                response = Response.objects.create(
-                    survey=survey,
-                    respondent=request.user
-                )
-                
-                # Sauvegarder les réponses
-                for question, form in question_forms:
-                    if form.is_valid():
-                        answer = form.save(commit=False)
-                        answer.response = response
-                        answer.question = question
-                        answer.save()
-                        
-                        # Gérer les choix pour les questions à choix
-                        if question.question_type in ['single', 'multiple']:
-                            form.save_m2m()
-                
-                messages.success(request, "Merci pour votre participation!")
-                return redirect('surveys:survey_results', pk=survey.pk)
-                
+            # Réponse, réponses aux questions et choix écrits en un nombre fixe de requêtes,
+            # éventuellement regroupés avec d'autres participations (SURVEY_GROUP_COMMIT)
+            submit_answers(survey, request.user, answers)
         except Exception as e:
-            messages.error(request, f"Une erreur est survenue lors de l'enregistrement de vos réponses : {str(e)}")
-            context = self.get_context_data(object=survey)
-            context['question_forms'] = question_forms
-            return render(request, self.template_name, context)
+            return self.render_page(
+                page,
+                build_answer_forms(pages[page - 1], data=request.POST),
+                f"Une erreur est survenue lors de l'enregistrement de vos réponses : {str(e)}"
+            )
+
+        delete_draft(request, survey)
+        messages.success(request, "Merci pour votre participation!")
+        return redirect('surveys:survey_results', pk=survey.pk)
+
+
+class SurveyParticipationDraftView(SurveyParticipateView):
+    """Enregistrement automatique du brouillon de la page en cours (JSON, sans écriture en base)"""
+    http_method_names = ['post']
 
+    def test_func(self):
+        return self.get_participation_error(self.get_object()) is None
+
+    def post(self, request, *args, **kwargs):
+        survey = self.get_object()
+        pages = self.get_pages(get_schema(survey))
+        page = self.get_page_number(request.POST.get('page', '1'), pages)
+        draft = autosave_draft(request, survey, extract_draft_values(pages[page - 1], request.POST))
+        return JsonResponse({'saved': True, 'answers': len(draft)})
 
-class SurveyResultsView(LoginRequiredMixin, UserPassesTestMixin, DetailView):
+
+class SurveyPublicParticipateView(SingleObjectMixin, View):
+    """Participation sans compte à un sondage public anonyme (gros volumes)
+
+    Le participant est reconnu par un jeton dans un cookie signé ; la contrainte
+    unique (sondage, jeton) empêche une seconde participation. La vue ne lit ni
+    la session ni l'utilisateur : une participation coûte la lecture du sondage
+    et l'écriture des réponses, sans requête d'authentification.
+    """
     model = Survey
-    template_name = 'survey/results.html'
-    context_object_name = 'survey'
+    template_name = 'survey/public_participate.html'
+    cookie_name = 'survey_respondent'
+    cookie_salt = 'survey-respondent'
+    cookie_max_age = 60 * 60 * 24 * 365
+    participation_cache_timeout = SurveyParticipateView.participation_cache_timeout
+
+    def get_queryset(self):
+        return Survey.objects.filter(anonymous=True, status='published')
+
+    def get_respondent_token(self):
+        return self.request.get_signed_cookie(self.cookie_name, default=None, salt=self.cookie_salt)
+
+    def get_participation_error(self, survey, token):
+        now = timezone.now()
+        if now < survey.start_date:
+            return "Ce sondage n'a pas encore commencé."
+        if now > survey.end_date:
+            return "Ce sondage est terminé."
+        if token and Response.objects.filter(survey=survey, respondent_token=token).exists():
+            return "Vous avez déjà participé à ce sondage. Merci !"
+        return None
+
+    def render_form(self, survey, question_forms=None, error=None, status=200):
+        context = {
+            'survey': survey,
+            'branching': get_schema(survey).branching(),
+            'error': error,
+            'form_errors': question_forms is not None,
+            'question_forms': question_forms or (lambda: build_answer_forms(get_schema(survey).questions)),
+            'participation_cache_timeout': self.participation_cache_timeout,
+            # Remplacent les variables des processeurs de contexte, qui liraient la session
+            'user': AnonymousUser(),
+            'messages': (),
+        }
+        return render(self.request, self.template_name, context, status=status)
+
+    def get(self, request, *args, **kwargs):
+        survey = self.get_object()
+        error = self.get_participation_error(survey, self.get_respondent_token())
+        return self.render_form(survey, error=error)
+
+    def post(self, request, *args, **kwargs):
+        survey = self.get_object()
+        token = self.get_respondent_token()
+        error = self.get_participation_error(survey, token)
+        if error:
+            return self.render_form(survey, error=error, status=409)
+
+        schema = get_schema(survey)
+        question_forms = build_answer_forms(schema.questions, data=request.POST)
+        visible = schema.visible_question_ids(extract_draft_values(schema.questions, request.POST))
+        answers = clean_answers(question_forms, visible)
+        if answers is None:
+            return self.render_form(survey, question_forms, "Veuillez corriger les erreurs ci-dessous.", status=400)
+
+        token = token or new_respondent_token()
+        try:
+            submit_answers(survey, None, answers, respondent_token=token)
+        except IntegrityError:
+            # Participation concurrente avec le même cookie
+            return self.render_form(survey, error="Vous avez déjà participé à ce sondage. Merci !", status=409)
+
+        response = redirect('surveys:public_participate', pk=survey.pk)
+        response.set_signed_cookie(
+            self.cookie_name, token, salt=self.cookie_salt,
+            max_age=self.cookie_max_age, httponly=True, samesite='Lax'
+        )
+        return response
+
+
+class SurveyResultsAccessMixin(UserPassesTestMixin):
+    """Accès aux résultats : le créateur, ou les participants une fois le sondage terminé"""
 
     def test_func(self):
         survey = self.get_object()
         user = self.request.user
         now = timezone.now()
         
+        # Participation chargée avec le sondage (SurveyObjectMixin)
+        self.has_participated = survey.user_has_participated
+        
         # Le créateur peut toujours voir les résultats
         if survey.creator == user:
             return True
@@ -432,62 +723,375 @@ class SurveyResultsView(LoginRequiredMixin, UserPassesTestMixin, DetailView):
         # Pour les autres utilisateurs :
         # 1. Le sondage doit être terminé
         # 2. L'utilisateur doit avoir participé
-        has_participated = Response.objects.filter(
-            survey=survey,
-            respondent=user
-        ).exists()
+        return now > survey.end_date and self.has_participated
+
+    def get_segment_choices(self, survey):
+        """Choix du sondage passés en filtre (`?choice=`) pour restreindre les participants"""
+        choice_ids = [value for value in self.request.GET.getlist('choice') if value.isdigit()]
+        if not choice_ids:
+            return []
+        return list(Choice.objects.filter(
+            question__survey=survey,
+            pk__in=choice_ids
+        ).select_related('question'))
+
+    def get_window(self):
+        """Fenêtre de dates (`?since=` et `?until=`, inclusives) en datetimes du fuseau courant"""
+        bounds = []
+        for name in ('since', 'until'):
+            try:
+                bounds.append(parse_date(self.request.GET.get(name, '')))
+            except ValueError:
+                bounds.append(None)
+        since, until = bounds
+        if not since and not until:
+            return None
         
-        return now > survey.end_date and has_participated
+        start = self.object.start_date
+        if since:
+            start = start_of_day(since)
+        # Sans borne de fin, inclure l'heure en cours
+        end = timezone.now() + timedelta(hours=1)
+        if until:
+            end = start_of_day(until + timedelta(days=1))
+        return start, end
+
+    def load_result_filters(self, survey):
+        """Prépare le segment de participants et la fenêtre de dates demandés"""
+        self.segment_choices = self.get_segment_choices(survey)
+        self.segment = segment_responses(
+            survey,
+            [choice.id for choice in self.segment_choices]
+        ) if self.segment_choices else None
+        self.window = self.get_window()
+
+    def get_filtered_responses(self, survey):
+        """Participations retenues par les filtres, ou None pour le sondage entier"""
+        if self.segment is None and self.window is None:
+            return None
+        responses = self.segment if self.segment is not None else Response.objects.filter(survey=survey)
+        return restrict_to_window(responses, self.window)
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        survey = self.get_object()
-        now = timezone.now()
+        survey = self.object
         
         # Ajouter des informations sur l'accès aux résultats
         context['is_creator'] = survey.creator == self.request.user
-        context['is_ended'] = now > survey.end_date
-        context['has_participated'] = Response.objects.filter(
-            survey=survey,
-            respondent=self.request.user
-        ).exists()
-        
-        # Calculer les statistiques pour chaque question
-        questions_stats = []
-        for question in survey.questions.all():
-            stats = {
-                'question': question,
-                'total_responses': Answer.objects.filter(question=question).count(),
-            }
-            
-            if question.question_type == 'text':
-                # Pour les questions texte, récupérer toutes les réponses
-                stats['text_answers'] = Answer.objects.filter(
-                    question=question
-                ).values_list('text_answer', flat=True)
-            else:
-                # Pour les questions à choix, calculer les pourcentages
-                total = Answer.objects.filter(question=question).count()
-                choices_stats = []
-                
-                for choice in question.choices.all():
-                    choice_count = Answer.objects.filter(
-                        question=question,
-                        selected_choices=choice
-                    ).count()
-                    
-                    percentage = (choice_count / total * 100) if total > 0 else 0
-                    choices_stats.append({
-                        'choice': choice,
-                        'count': choice_count,
-                        'percentage': round(percentage, 1)
-                    })
-                
-                stats['choices_stats'] = choices_stats
-            
-            questions_stats.append(stats)
+        context['is_ended'] = timezone.now() > survey.end_date
+        context['has_participated'] = self.has_participated
+        # Le flux en direct n'est proposé que sous ASGI (voir SurveyLiveResultsView)
+        context['live_results'] = isinstance(self.request, ASGIRequest)
+        
+        # Segment de participants défini par les choix sélectionnés et fenêtre de dates
+        self.load_result_filters(survey)
+        context['segment_choices'] = self.segment_choices
+        context['segment_choice_ids'] = [choice.id for choice in self.segment_choices]
+        context['window'] = self.window
+        context['since'] = self.request.GET.get('since', '')
+        context['until'] = self.request.GET.get('until', '')
+        return context
+
+
+class SurveyResultsView(LoginRequiredMixin, SurveyObjectMixin, SurveyResultsAccessMixin, DetailView):
+    model = Survey
+    template_name = 'survey/results.html'
+    context_object_name = 'survey'
+    # Paramètres de la requête qui changent les résultats affichés
+    result_params = ('choice', 'since', 'until', 'granularity')
+
+    def get_result_params(self):
+        """Filtres demandés sous une forme canonique, pour les clés de cache et l'ETag"""
+        return urlencode(sorted(
+            (name, sorted(self.request.GET.getlist(name)))
+            for name in self.result_params if name in self.request.GET
+        ), doseq=True)
+
+    def get(self, request, *args, **kwargs):
+        self.object = self.get_object()
+        self.results_version, results_modified = read_results_version(self.object)
         
+        # La page dépend des résultats, du sondage et de l'utilisateur qui la consulte
+        etag = quote_etag(md5(':'.join(str(part) for part in (
+            self.results_version,
+            self.object.updated_at.timestamp(),
+            request.user.pk,
+            timezone.now() > self.object.end_date,
+            self.get_result_params(),
+        )).encode()).hexdigest())
+        last_modified = int(max(results_modified, self.object.updated_at).timestamp())
+        
+        response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if response is None:
+            response = self.render_to_response(self.get_context_data(object=self.object))
+        response.headers['ETag'] = etag
+        response.headers['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
+
+    def compute_results(self):
+        """Statistiques et série de participations, sans passer par le cache"""
+        # Calculer les statistiques de toutes les questions en un nombre fixe de requêtes
+        total_participants, questions_stats = survey_results(self.object, self.segment, self.window)
+        
+        # Participations dans le temps, lues dans les compteurs horaires
+        granularity = 'hour' if self.request.GET.get('granularity') == 'hour' else 'day'
+        start, end = self.window or (None, None)
+        series = participation_series(self.object, granularity, start, end)
+        return total_participants, questions_stats, granularity, {
+            'labels': [
+                timezone.localtime(period).strftime('%d/%m %Hh') if granularity == 'hour' else period.strftime('%d/%m/%Y')
+                for period, _ in series
+            ],
+            'counts': [count for _, count in series],
+        }
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        
+        # Résultats mis en cache par version : toute nouvelle participation ou
+        # modification des questions change la version et donc la clé
+        total_participants, questions_stats, granularity, series = cache.get_or_set(
+            results_cache_key(self.object, self.results_version, self.get_result_params()),
+            self.compute_results,
+            RESULTS_CACHE_TIMEOUT
+        )
         context['questions_stats'] = questions_stats
-        context['total_participants'] = Response.objects.filter(survey=survey).count()
+        context['total_participants'] = total_participants
+        context['has_text_questions'] = any(
+            stats['question'].question_type == 'text' for stats in questions_stats
+        )
+        context['granularity'] = granularity
+        context['participation_series'] = series
+        
+        return context
+
+
+class SurveyLiveResultsView(View):
+    """Flux Server-Sent Events des écarts de résultats, pour les pages ouvertes pendant le sondage.
+    
+    Vue asynchrone : servie par ASGI, une connexion ouverte n'occupe pas de thread.
+    Sous WSGI, le flux infini occuperait un thread pour toujours : la vue répond
+    aussitôt 204, ce qui arrête aussi les reconnexions d'EventSource.
+    """
+
+    async def get(self, request, pk):
+        if not isinstance(request, ASGIRequest):
+            return HttpResponse(status=204)
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        survey = await aget_object_or_404(Survey, pk=pk)
+        
+        # Mêmes règles d'accès que la page de résultats
+        if survey.creator_id != user.pk:
+            has_participated = await Response.objects.filter(survey=survey, respondent=user).aexists()
+            if not (timezone.now() > survey.end_date and has_participated):
+                raise PermissionDenied
+        
+        response = StreamingHttpResponse(live_events(survey), content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
+
+class SurveyCrosstabView(LoginRequiredMixin, SurveyObjectMixin, SurveyResultsAccessMixin, DetailView):
+    model = Survey
+    template_name = 'survey/crosstab.html'
+    context_object_name = 'survey'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        choice_questions = list(self.object.questions.exclude(question_type='text'))
+        context['choice_questions'] = choice_questions
+        
+        # Les deux questions croisées doivent être des questions à choix distinctes du sondage
+        questions = {str(question.id): question for question in choice_questions}
+        row_question = questions.get(self.request.GET.get('row'))
+        column_question = questions.get(self.request.GET.get('column'))
+        if row_question and column_question and row_question != column_question:
+            context['crosstab'] = crosstab(row_question, column_question, self.get_filtered_responses(self.object))
         
-        return context
\ No newline at end of file
+        return context
+
+
+class SurveyTextSearchView(LoginRequiredMixin, SurveyObjectMixin, SurveyResultsAccessMixin, DetailView):
+    model = Survey
+    template_name = 'survey/text_search.html'
+    context_object_name = 'survey'
+    page_size = 20
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        text_questions = list(self.object.questions.filter(question_type='text'))
+        context['text_questions'] = text_questions
+        
+        query = self.request.GET.get('q', '').strip()
+        question = {str(q.id): q for q in text_questions}.get(self.request.GET.get('question'))
+        page = self.request.GET.get('page', '1')
+        page = int(page) if page.isdigit() and int(page) > 0 else 1
+        
+        # Réponses classées par pertinence, paginées sans COUNT global
+        answers, has_next = search_text_answers(
+            self.object,
+            query,
+            question=question,
+            limit=self.page_size,
+            offset=(page - 1) * self.page_size
+        )
+        questions = {q.id: q for q in text_questions}
+        context.update({
+            'query': query,
+            'selected_question': question,
+            'results': [(questions.get(answer.question_id), answer) for answer in answers],
+            'page': page,
+            'has_previous': page > 1,
+            'has_next': has_next,
+        })
+        return context
+
+
+class SurveyTextAnswersView(LoginRequiredMixin, SurveyObjectMixin, SurveyResultsAccessMixin, SingleObjectMixin, View):
+    """Pages suivantes des réponses texte d'une question, au format JSON"""
+    model = Survey
+
+    def get(self, request, *args, **kwargs):
+        survey = self.get_object()
+        question = get_object_or_404(Question, pk=kwargs['question_pk'], survey=survey, question_type='text')
+        after = request.GET.get('after', '')
+        
+        self.object = survey
+        self.load_result_filters(survey)
+        page, next_cursor = text_answers_page(
+            question,
+            after=int(after) if after.isdigit() else None,
+            responses=self.get_filtered_responses(survey)
+        )
+        return JsonResponse({
+            'answers': [{'id': answer_id, 'text': text} for answer_id, text in page],
+            'next': next_cursor,
+        })
+
+
+class SurveyExportView(LoginRequiredMixin, SurveyObjectMixin, UserPassesTestMixin, SingleObjectMixin, View):
+    model = Survey
+
+    def test_func(self):
+        # Seul le créateur peut exporter les réponses brutes
+        return self.get_object().creator == self.request.user
+
+    def get(self, request, *args, **kwargs):
+        survey = self.get_object()
+        export_format = request.GET.get('format', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            export_format = 'csv'
+
+        response = StreamingHttpResponse(
+            stream_export(survey, export_format),
+            content_type=EXPORT_FORMATS[export_format]
+        )
+        response['Content-Disposition'] = f'attachment; filename="sondage-{survey.pk}.{export_format}"'
+        return response
+
+
+class SurveySubmissionsApiView(LoginRequiredMixin, SurveyObjectMixin, SingleObjectMixin, View):
+    """Dépôt de participations en JSON, une seule ou un lot (bornes hors ligne).
+    
+    Corps attendu : {"answers": {...}} pour sa propre participation, ou
+    {"submissions": [{"respondent_token": "<jeton>", "answers": {...}}, ...]}
+    pour un lot, réservé au créateur d'un sondage anonyme. Les participations
+    d'un lot sont anonymes : elles ne sont jamais attribuées à un compte, et le
+    jeton (facultatif, généré s'il manque) sert à écarter les doublons. Les
+    réponses associent l'id d'une question à un id de choix, une liste d'ids
+    de choix ou un texte. Le lot est écrit en une transaction ; le résultat
+    est donné participation par participation.
+    """
+    model = Survey
+    max_batch_size = 500
+    max_token_length = 64
+
+    def post(self, request, *args, **kwargs):
+        survey = self.get_object()
+        if not survey.is_active():
+            return JsonResponse({'error': "Ce sondage n'est pas ouvert aux participations."}, status=409)
+        
+        try:
+            payload = json.loads(request.body)
+        except ValueError:
+            return JsonResponse({'error': "Corps JSON invalide."}, status=400)
+        if not isinstance(payload, dict):
+            return JsonResponse({'error': "Un objet JSON est attendu."}, status=400)
+        
+        is_batch = 'submissions' in payload
+        items = payload['submissions'] if is_batch else [payload]
+        if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            return JsonResponse({'error': "`submissions` doit être une liste d'objets."}, status=400)
+        if len(items) > self.max_batch_size:
+            return JsonResponse({'error': f"Au plus {self.max_batch_size} participations par lot."}, status=400)
+        if is_batch and survey.creator != request.user:
+            return JsonResponse({'error': "Seul le créateur du sondage peut déposer un lot."}, status=403)
+        if is_batch and not survey.anonymous:
+            return JsonResponse({'error': "Les lots ne sont acceptés que pour les sondages anonymes."}, status=409)
+        
+        # Participations existantes, chargées en une requête
+        if is_batch:
+            tokens = [item.get('respondent_token') or new_respondent_token() for item in items]
+            already = set(Response.objects.filter(
+                survey=survey,
+                respondent_token__in=[token for token in tokens if isinstance(token, str)]
+            ).values_list('respondent_token', flat=True))
+        else:
+            tokens = [None]
+            already = {request.user.pk} if survey.user_has_participated else set()
+        
+        schema = get_schema(survey)
+        results = []
+        valid = []
+        for index, (item, token) in enumerate(zip(items, tokens)):
+            # Un lot n'est jamais attribué à un compte
+            respondent = None if is_batch else request.user
+            key = token if is_batch else request.user.pk
+            answers, errors = clean_json_answers(
+                schema,
+                item.get('answers') if isinstance(item.get('answers'), dict) else {}
+            )
+            if is_batch and 'respondent' in item:
+                errors = {'respondent': ["Un lot ne peut pas répondre au nom d'un utilisateur ; utilisez `respondent_token`."]}
+            elif is_batch and not (isinstance(token, str) and len(token) <= self.max_token_length):
+                errors = {'respondent_token': [f"Jeton invalide ({self.max_token_length} caractères au plus)."]}
+            elif key in already:
+                errors = {'respondent': ["Ce participant a déjà répondu à ce sondage."]}
+            if answers is None or errors:
+                results.append({'index': index, 'status': 'invalid', 'errors': errors})
+                continue
+            already.add(key)
+            valid.append((index, respondent, token, answers))
+            results.append(None)
+        
+        if valid:
+            try:
+                saved = save_submissions(survey, [(respondent, token, answers) for _, respondent, token, answers in valid])
+            except IntegrityError:
+                # Participation concurrente : reprise une par une, chacune dans son point de sauvegarde
+                saved = write_batch([(survey, respondent, answers, token) for _, respondent, token, answers in valid])
+            for (index, _, _, _), response in zip(valid, saved):
+                if isinstance(response, Exception):
+                    results[index] = {'index': index, 'status': 'error', 'errors': {'respondent': [str(response)]}}
+                else:
+                    results[index] = {'index': index, 'status': 'created', 'response': response.pk}
+        
+        created = sum(result['status'] == 'created' for result in results)
+        if not is_batch:
+            return JsonResponse(results[0], status=201 if created else 400)
+        return JsonResponse({'created': created, 'results': results})
+
+
+class AdmissionStatusView(LoginRequiredMixin, UserPassesTestMixin, View):
+    """État du contrôle d'admission du processus (JSON, réservé au personnel)"""
+    
+    def test_func(self):
+        return self.request.user.is_staff
+    
+    def get(self, request, *args, **kwargs):
+        limiter = get_limiter()
+        return JsonResponse({'enabled': True, **limiter.stats()} if limiter else {'enabled': False})
@@ -0,0 +1,132 @@
+"""Écriture groupée des participations (« group commit »).
+
+Sous SQLite, une seule transaction d'écriture peut être ouverte à la fois :
+lors d'un afflux de participations, les transactions concurrentes des
+requêtes se disputent le verrou et échouent avec « database is locked ».
+Quand `SURVEY_GROUP_COMMIT` est activé, les participations validées sont
+confiées à un unique thread d'écriture par processus, qui les enregistre par
+lots dans une seule transaction. Chaque participation a son propre point de
+sauvegarde : un doublon (contrainte unique sondage/participant) n'annule que
+la participation fautive. La requête attend que son lot soit validé en base ;
+passé `WRITER_RESULT_TIMEOUT`, une participation qui n'a pas encore été prise
+en charge est annulée, pour ne jamais signaler un échec à tort.
+
+Réglages :
+- `SURVEY_GROUP_COMMIT` : active l'écriture groupée (désactivée par défaut) ;
+- `SURVEY_GROUP_COMMIT_BATCH_SIZE` : nombre maximal de participations par lot ;
+- `SURVEY_GROUP_COMMIT_MAX_LATENCY` : attente maximale (secondes) pour compléter un lot.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+from .services import save_submission
+
+# Attente maximale (secondes) d'une requête pour la validation de son lot
+WRITER_RESULT_TIMEOUT = 30
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def write_batch(items):
+    """Enregistre un lot de participations dans une transaction, une par point de sauvegarde.
+
+    `items` est une liste de (sondage, participant, réponses, jeton anonyme). Retourne pour
+    chaque participation la `Response` créée ou l'exception qui l'a fait échouer.
+    """
+    results = []
+    with transaction.atomic():
+        for survey, respondent, answers, respondent_token in items:
+            try:
+                # save_submission est atomique : imbriquée, elle ouvre un point de sauvegarde
+                results.append(save_submission(survey, respondent, answers, respondent_token))
+            except Exception as e:
+                results.append(e)
+    return results
+
+
+class SubmissionWriter:
+    """Thread unique qui regroupe les participations en lots avant de les écrire."""
+
+    def __init__(self, batch_size, max_latency):
+        self.batch_size = batch_size
+        self.max_latency = max_latency
+        self.queue = queue.Queue()
+        self.thread = None
+
+    def submit(self, survey, respondent, answers, respondent_token=None):
+        """Confie une participation au thread d'écriture et attend qu'elle soit enregistrée."""
+        future = Future()
+        self.ensure_started()
+        self.queue.put((future, (survey, respondent, answers, respondent_token)))
+        try:
+            return future.result(timeout=WRITER_RESULT_TIMEOUT)
+        except FutureTimeoutError:
+            # Pas encore prise en charge : annulée, elle ne sera jamais écrite
+            if future.cancel():
+                raise
+            # Déjà dans un lot en cours d'écriture : son issue réelle est rapportée
+            return future.result()
+
+    def ensure_started(self):
+        # Le thread est (re)démarré à la demande, y compris après un fork du serveur
+        with _writer_lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name='survey-submission-writer', daemon=True)
+                self.thread.start()
+
+    def next_batch(self):
+        """Attend une participation puis complète le lot jusqu'à sa taille ou sa latence maximale."""
+        batch = [self.queue.get()]
+        deadline = time.monotonic() + self.max_latency
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def run(self):
+        while True:
+            # Les participations abandonnées par leur requête (délai dépassé) sont écartées
+            batch = [(future, item) for future, item in self.next_batch() if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+            close_old_connections()
+            try:
+                results = write_batch([item for _, item in batch])
+            except Exception as e:
+                # Échec de la validation du lot : aucune participation n'est enregistrée
+                results = [e] * len(batch)
+            for (future, _), result in zip(batch, results):
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+
+def get_submission_writer():
+    """Thread d'écriture du processus, créé au premier appel."""
+    global _writer
+    with _writer_lock:
+        if _writer is None:
+            _writer = SubmissionWriter(
+                getattr(settings, 'SURVEY_GROUP_COMMIT_BATCH_SIZE', 50),
+                getattr(settings, 'SURVEY_GROUP_COMMIT_MAX_LATENCY', 0.005),
+            )
+    return _writer
+
+
+def submit_answers(survey, respondent, answers, respondent_token=None):
+    """Enregistre une participation validée, par lots si l'écriture groupée est activée."""
+    if getattr(settings, 'SURVEY_GROUP_COMMIT', False):
+        return get_submission_writer().submit(survey, respondent, answers, respondent_token)
+    return save_submission(survey, respondent, answers, respondent_token)